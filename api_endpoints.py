@@ -3,17 +3,24 @@ FastAPI endpoints for Vanlu API
 """
 
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query
-from fastapi.responses import JSONResponse
-from typing import List, Optional
+from fastapi.responses import JSONResponse, StreamingResponse
+from sse_starlette.sse import EventSourceResponse
+from typing import List, Optional, AsyncIterator, Dict, Any
+from datetime import datetime
+import json
 import logging
 
 from models import (
     ChatMessage, ChatResponse, ScrapeRequest, ScrapeResponse,
     CrawlRequest, CrawlResponse, SearchRequest, SearchResponse,
     AppointmentRequest, AppointmentResponse, SessionInfo, SessionList,
-    HealthStatus, CompetitorAnalysis
+    HealthStatus, CompetitorAnalysis, CompetitorBatchRequest, VehicleClassifyRequest, VehicleClassifyResponse,
+    VehicleClassification, VehicleCategory
 )
 from services import get_services
+from search_cache import get_search_cache
+from http_clients import get_http_pool
+from vehicle_catalog import get_vehicle_catalog
 
 logger = logging.getLogger(__name__)
 
@@ -22,14 +29,20 @@ api_router = APIRouter(prefix="/api/v1")
 chat_router = APIRouter(prefix="/chat", tags=["chat"])
 scraping_router = APIRouter(prefix="/scraping", tags=["web-scraping"])
 analytics_router = APIRouter(prefix="/analytics", tags=["analytics"])
+vehicles_router = APIRouter(prefix="/vehicles", tags=["vehicles"])
 admin_router = APIRouter(prefix="/admin", tags=["administration"])
 
+async def sse_events(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[Dict[str, str]]:
+    """Serialize service stream events into Server-Sent Events"""
+    async for event in events:
+        yield {
+            "event": event["event"],
+            "data": json.dumps(event["data"], ensure_ascii=False, default=str)
+        }
+
 # Chat endpoints
 @chat_router.post("/", response_model=ChatResponse)
-async def chat_with_luciano(
-    message: ChatMessage,
-    background_tasks: BackgroundTasks
-):
+async def chat_with_luciano(message: ChatMessage):
     """Chat com o agente Luciano"""
     try:
         services = get_services()
@@ -38,18 +51,26 @@ async def chat_with_luciano(
         if not luciano_service:
             raise HTTPException(status_code=503, detail="Agent service not available")
 
-        # Process message
+        # Process message (the session store expires idle sessions on insert)
         response = await luciano_service.chat(message.message, message.session_id)
 
-        # Add cleanup task in background
-        background_tasks.add_task(luciano_service.cleanup_expired_sessions)
-
         return response
 
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@chat_router.post("/stream")
+async def chat_with_luciano_stream(message: ChatMessage):
+    """Chat com o agente Luciano com resposta em streaming (SSE)"""
+    services = get_services()
+    luciano_service = services["luciano"]
+
+    if not luciano_service:
+        raise HTTPException(status_code=503, detail="Agent service not available")
+
+    return EventSourceResponse(sse_events(luciano_service.chat_stream(message.message, message.session_id)))
+
 @chat_router.get("/sessions", response_model=SessionList)
 async def list_chat_sessions():
     """List all active chat sessions"""
@@ -60,15 +81,15 @@ async def list_chat_sessions():
         if not luciano_service:
             raise HTTPException(status_code=503, detail="Agent service not available")
 
-        sessions = luciano_service.get_all_sessions()
+        sessions = await luciano_service.get_all_sessions().aitems()
 
         session_list = []
-        for session_id, session_data in sessions.items():
+        for session_id, session_data in sessions:
             session_info = SessionInfo(
                 session_id=session_id,
                 created_at=session_data["created_at"],
                 last_activity=session_data["last_activity"],
-                message_count=len(session_data.get("messages", [])),
+                message_count=session_data.get("message_count", 0),
                 status="active"
             )
             session_list.append(session_info)
@@ -100,7 +121,7 @@ async def get_session_details(session_id: str):
             session_id=session_id,
             created_at=session_data["created_at"],
             last_activity=session_data["last_activity"],
-            message_count=len(session_data.get("messages", [])),
+            message_count=session_data.get("message_count", 0),
             status="active"
         )
 
@@ -120,12 +141,9 @@ async def delete_session(session_id: str):
         if not luciano_service:
             raise HTTPException(status_code=503, detail="Agent service not available")
 
-        sessions = luciano_service.get_all_sessions()
-        if session_id not in sessions:
+        if not await luciano_service.delete_session(session_id):
             raise HTTPException(status_code=404, detail="Session not found")
 
-        del sessions[session_id]
-
         return {"message": f"Session {session_id} deleted successfully"}
 
     except HTTPException:
@@ -162,12 +180,8 @@ async def create_appointment(appointment: AppointmentRequest):
             f"Te espero aqui na Vanlu! 🚗"
         )
 
-        # Update session with appointment data
-        session_data["customer_data"] = {
-            "appointment": appointment.dict(),
-            "appointment_confirmed": True,
-            "total_price": price
-        }
+        # Update session with appointment data (and the conversion counters)
+        luciano_service.confirm_appointment(appointment.session_id, session_data, appointment, price)
 
         return AppointmentResponse(
             success=True,
@@ -220,6 +234,45 @@ async def crawl_website(request: CrawlRequest):
         logger.error(f"Error in crawl endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@scraping_router.get("/crawl/{crawl_id}", response_model=CrawlResponse)
+async def get_crawl_status(crawl_id: str):
+    """Get the status and results of a crawl"""
+    try:
+        services = get_services()
+        scraping_service = services["scraping"]
+
+        if not scraping_service:
+            raise HTTPException(status_code=503, detail="Scraping service not available")
+
+        result = scraping_service.get_crawl(crawl_id)
+        if result is None:
+            raise HTTPException(status_code=404, detail="Crawl not found")
+        return result
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting crawl status: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@scraping_router.get("/cache")
+async def get_scrape_cache_stats():
+    """Get scrape cache statistics"""
+    try:
+        services = get_services()
+        scraping_service = services["scraping"]
+
+        if not scraping_service:
+            raise HTTPException(status_code=503, detail="Scraping service not available")
+
+        return scraping_service.cache.get_stats()
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting scrape cache stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @scraping_router.post("/search", response_model=SearchResponse)
 async def search_competitors(
     query: str = Query(..., description="Search query"),
@@ -234,16 +287,15 @@ async def search_competitors(
         if not competitor_service:
             raise HTTPException(status_code=503, detail="Competitor service not available")
 
-        competitors = await competitor_service.search_competitors(location)
-
-        # Filter and limit results
-        filtered_competitors = competitors[:limit]
+        # Served from the location's snapshot, filtered and limited locally
+        competitors, snapshot = await competitor_service.find_competitors(location, query)
 
         return SearchResponse(
             success=True,
             query=query,
-            results=filtered_competitors,
-            total_found=len(competitors)
+            results=competitors[:limit],
+            total_found=len(competitors),
+            snapshot_age_seconds=round(snapshot.age, 1)
         )
 
     except Exception as e:
@@ -267,6 +319,29 @@ async def analyze_competitor(url: str = Query(..., description="Competitor websi
         logger.error(f"Error in competitor analysis: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@scraping_router.post("/analyze/batch")
+async def analyze_competitors(request: CompetitorBatchRequest):
+    """Analyze many competitors concurrently, streaming each result as NDJSON"""
+    services = get_services()
+    competitor_service = services["competitor"]
+
+    if not competitor_service:
+        raise HTTPException(status_code=503, detail="Competitor service not available")
+
+    urls = request.target_urls()
+    if not urls:
+        raise HTTPException(status_code=400, detail="No competitor URLs given")
+
+    async def ndjson_lines() -> AsyncIterator[str]:
+        try:
+            async for analysis in competitor_service.analyze_competitors(urls):
+                yield analysis.model_dump_json() + "\n"
+        except Exception as e:
+            logger.error(f"Error in batch competitor analysis: {str(e)}")
+            yield json.dumps({"success": False, "message": str(e)}) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
 # Analytics endpoints
 @analytics_router.get("/conversations")
 async def get_conversation_analytics():
@@ -348,9 +423,9 @@ async def cleanup_expired_sessions():
             raise HTTPException(status_code=503, detail="Agent service not available")
 
         # Clean up sessions
-        luciano_service.cleanup_expired_sessions()
+        expired = luciano_service.cleanup_expired_sessions()
 
-        return {"message": "Cleanup completed successfully"}
+        return {"message": "Cleanup completed successfully", "expired_sessions": expired}
 
     except Exception as e:
         logger.error(f"Error in cleanup: {str(e)}")
@@ -367,13 +442,23 @@ async def get_system_stats():
             raise HTTPException(status_code=503, detail="Agent service not available")
 
         sessions = luciano_service.get_all_sessions()
-        total_messages = sum(len(session.get("messages", [])) for session in sessions.values())
+        session_items = await sessions.aitems()
+        total_messages = sum(session.get("message_count", 0) for _, session in session_items)
 
         return {
-            "total_sessions": len(sessions),
+            "total_sessions": len(session_items),
             "total_messages": total_messages,
             "services_count": len(services),
             "active_services": len([s for s in services.values() if s]),
+            "agent": luciano_service.runner.get_stats(),
+            "fast_path": luciano_service.fast_path.get_stats() if luciano_service.fast_path else None,
+            "templates": luciano_service.templates.get_stats() if luciano_service.templates else None,
+            "history": luciano_service.history_manager.get_stats() if luciano_service.history_manager else None,
+            "session_store": await sessions.aget_stats(),
+            "search_cache": get_search_cache().get_stats(),
+            "scraping": services["scraping"].get_stats() if services["scraping"] else None,
+            "http_pool": get_http_pool().get_stats(),
+            "vehicle_catalog": get_vehicle_catalog().get_stats(),
             "version": "1.0.0"
         }
 
@@ -381,10 +466,37 @@ async def get_system_stats():
         logger.error(f"Error getting system stats: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Vehicle catalog endpoints
+@vehicles_router.post("/classify", response_model=VehicleClassifyResponse)
+async def classify_vehicles(request: VehicleClassifyRequest):
+    """Classify vehicle models (e.g. a fleet list) into price categories P/G"""
+    try:
+        matches = get_vehicle_catalog().classify_many(request.models)
+
+        vehicles = []
+        categories = {category.value: 0 for category in VehicleCategory}
+        for model, match in zip(request.models, matches):
+            if match:
+                classification = VehicleClassification(
+                    input=model, brand=match.brand or None, model=match.model,
+                    category=match.category, match=match.match, score=match.score
+                )
+            else:
+                classification = VehicleClassification(input=model, category=VehicleCategory.PEQUENO, match="none")
+            categories[classification.category.value] += 1
+            vehicles.append(classification)
+
+        return VehicleClassifyResponse(total=len(vehicles), categories=categories, vehicles=vehicles)
+
+    except Exception as e:
+        logger.error(f"Error classifying vehicles: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Include routers in main API router
 api_router.include_router(chat_router)
 api_router.include_router(scraping_router)
 api_router.include_router(analytics_router)
+api_router.include_router(vehicles_router)
 api_router.include_router(admin_router)
 
 # Export the main router
@@ -0,0 +1,72 @@
+"""
+Throughput check for concurrent agent turns
+
+Runs N chats through LucianoAgentService against a fake graph whose turns
+take a fixed time, and verifies that N concurrent chats finish in about the
+time of one instead of N times as long.
+
+Usage: python benchmarks/chat_concurrency.py [--chats 20] [--latency 0.5]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage
+
+from services import AgentRunner, LucianoAgentService
+
+class SlowGraph:
+    """Stand-in for the compiled agent graph with a fixed turn latency"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def ainvoke(self, payload, config=None):
+        await asyncio.sleep(self.latency)
+        return {"messages": payload["messages"] + [AIMessage(content="Olá! Qual o modelo do seu carro?")]}
+
+async def run(chats: int, latency: float, max_concurrency: int) -> dict:
+    graph = SlowGraph(latency)
+    # Canned replies would answer "Oi" without touching the graph
+    service = LucianoAgentService(graph, [], runner=AgentRunner(graph, max_concurrency=max_concurrency),
+                                  enable_fast_path=False, enable_templates=False)
+
+    start = time.perf_counter()
+    await service.chat("Oi", "warmup")
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(service.chat("Oi", f"session_{i}") for i in range(chats)))
+    concurrent = time.perf_counter() - start
+
+    return {
+        "chats": chats,
+        "max_concurrency": max_concurrency,
+        "single_chat_seconds": round(single, 3),
+        "concurrent_seconds": round(concurrent, 3),
+        "ratio": round(concurrent / single, 2),
+        "runner": service.runner.get_stats()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--max-concurrency", type=int, default=None)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.chats, args.latency, args.max_concurrency or args.chats))
+    print(json.dumps(result, indent=2))
+
+    # With enough permits every chat overlaps, so the batch costs about one turn
+    if result["max_concurrency"] >= args.chats and result["ratio"] > 1.5:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Microbenchmarks for the per-request pure-Python paths
+
+Times intent detection, next-action detection, request model validation,
+price lookup, conversation analytics and expired-session cleanup (at 1k, 10k
+and 100k sessions), fully offline. Results are printed as JSON and compared
+with a stored baseline: a case more than ``--tolerance`` times slower than
+its baseline is a regression and makes the run exit with status 1.
+
+Usage:
+    python benchmarks/hot_paths.py                       # compare with the baseline
+    python benchmarks/hot_paths.py --save-baseline       # record a new baseline
+    python benchmarks/hot_paths.py --only analytics      # cases whose name contains "analytics"
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intents import detect_intent
+from models import AppointmentRequest, CustomerInfo, VehicleCategory, VehicleInfo
+from services import AnalyticsService, LucianoAgentService
+from session_store import ShardedSessionStore
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "hot_paths.json")
+
+SESSION_COUNTS = [1_000, 10_000, 100_000]
+
+MESSAGES = [
+    "Quanto custa o polimento pro meu Onix 2019?",
+    "Vocês fazem vitrificação?",
+    "Queria agendar pra sábado de manhã",
+    "Qual o endereço de vocês?",
+    "Oi, bom dia! Aqui é a Ana",
+    "É um Compass 2022, bem sujo por dentro kkk",
+]
+
+AGENT_RESPONSES = [
+    "Perfeito! É super rápido por lá: https://www.vanluagendamento.online/ no nosso sistema",
+    "Show! Ficou agendado para sábado às 9h. Te espero lá!",
+    "Qual o modelo e o ano do seu carro?",
+    "A Vitrificação para o seu carro sai por R$ 800,00.",
+]
+
+APPOINTMENT = {
+    "vehicle": {"model": "Hilux", "year": 2021},
+    "service": "Polimento",
+    "preferred_date": "2025-12-20",
+    "preferred_time": "09:00",
+    "customer": {"name": "Carlos Souza", "phone": "(79) 99812-3456", "email": "carlos@example.com"},
+    "notes": "Carro com riscos na porta",
+    "session_id": "session_bench"
+}
+
+class NullGraph:
+    """The benchmarked paths never run the agent"""
+
+def new_service(max_sessions: int = 1000) -> LucianoAgentService:
+    store = ShardedSessionStore(max_sessions=max_sessions, ttl_seconds=3600)
+    return LucianoAgentService(NullGraph(), [], session_store=store)
+
+def populate(service: LucianoAgentService, count: int) -> List[Dict]:
+    """Fill the store with ``count`` sessions and matching analytics counters"""
+    sessions = []
+    for i in range(count):
+        session, _ = service.sessions.get_or_create(f"session_{i}", service._new_session)
+        session["message_count"] = 4
+        service.stats.record_conversation()
+        service.stats.record_intent(detect_intent(MESSAGES[i % len(MESSAGES)]))
+        if i % 5 == 0:
+            service.stats.record_appointment("Hilux" if i % 2 else "Onix")
+        sessions.append(session)
+    return sessions
+
+def time_per_op(fn: Callable[[], object], number: int, repeat: int = 5) -> float:
+    """Best of ``repeat`` runs, in nanoseconds per call"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter_ns() - start) / number)
+    return best
+
+def time_with_setup(setup: Callable[[], Callable[[], object]], repeat: int = 3) -> float:
+    """Best of ``repeat`` single calls, each on freshly built state, in nanoseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        fn = setup()
+        start = time.perf_counter_ns()
+        fn()
+        best = min(best, time.perf_counter_ns() - start)
+    return best
+
+def bench_cases(quick: bool) -> List[Tuple[str, Callable[[], float]]]:
+    service = new_service()
+    scale = 10 if quick else 1
+    cases = [
+        ("detect_intent", lambda: time_per_op(
+            lambda: [service._detect_intent(message) for message in MESSAGES], 20_000 // scale) / len(MESSAGES)),
+        ("determine_next_action", lambda: time_per_op(
+            lambda: [service._determine_next_action({}, response) for response in AGENT_RESPONSES],
+            20_000 // scale) / len(AGENT_RESPONSES)),
+        ("vehicle_info", lambda: time_per_op(lambda: VehicleInfo(model="Hilux", year=2021), 20_000 // scale)),
+        ("customer_info", lambda: time_per_op(
+            lambda: CustomerInfo(name="Carlos Souza", phone="(79) 99812-3456"), 20_000 // scale)),
+        ("appointment_request", lambda: time_per_op(lambda: AppointmentRequest(**APPOINTMENT), 10_000 // scale)),
+        ("get_service_price", lambda: time_per_op(
+            lambda: service.get_service_price("Vitrificação", VehicleCategory.GRANDE), 200_000 // scale)),
+    ]
+
+    for count in SESSION_COUNTS[:2] if quick else SESSION_COUNTS:
+        def analytics(count=count):
+            populated = new_service(max_sessions=count)
+            populate(populated, count)
+            return time_per_op(AnalyticsService(populated).get_conversation_analytics, 200)
+
+        def cleanup(count=count):
+            def setup():
+                populated = new_service(max_sessions=count)
+                sessions = populate(populated, count)
+                # The older half has been idle for two hours
+                idle = datetime.now() - timedelta(hours=2)
+                for session in sessions[:count // 2]:
+                    session["last_activity"] = idle
+                return populated.cleanup_expired_sessions
+            return time_with_setup(setup)
+
+        cases.append((f"conversation_analytics_{count // 1000}k", analytics))
+        cases.append((f"cleanup_expired_sessions_{count // 1000}k", cleanup))
+    return cases
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> Dict[str, Dict]:
+    comparison = {}
+    for name, ns in results.items():
+        if name not in baseline:
+            continue
+        ratio = ns / baseline[name]
+        comparison[name] = {
+            "baseline_ns": baseline[name],
+            "ratio": round(ratio, 2),
+            "regression": ratio > tolerance
+        }
+    return comparison
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Slowdown ratio that counts as a regression")
+    parser.add_argument("--only", default="", help="Run only cases whose name contains this text")
+    parser.add_argument("--quick", action="store_true", help="Fewer iterations and no 100k-session cases")
+    args = parser.parse_args()
+
+    # Session cleanup logs every run
+    logging.getLogger("services").setLevel(logging.WARNING)
+
+    results = {}
+    for name, run in bench_cases(args.quick):
+        if args.only in name:
+            results[name] = round(run(), 1)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "unit": "ns_per_op",
+        "results": results
+    }
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+            baseline_file.write("\n")
+        print(json.dumps(report, indent=2))
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            report["comparison"] = compare(results, json.load(baseline_file)["results"], args.tolerance)
+    print(json.dumps(report, indent=2))
+
+    regressions = [name for name, entry in report.get("comparison", {}).items() if entry["regression"]]
+    if regressions:
+        print(f"Regressions (> {args.tolerance}x baseline): {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
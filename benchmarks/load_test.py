@@ -0,0 +1,404 @@
+"""
+End-to-end load test of the chat endpoints with simulated OpenAI and Tavily
+
+Starts the real app (``uvicorn main:app``) in its own process with the
+OpenAI and Tavily APIs pointed at local fakes (``OPENAI_BASE_URL`` /
+``TAVILY_API_URL``) whose latencies follow a log-normal distribution, then
+drives multi-turn conversations through ``/chat`` and ``/api/v1/chat/``.
+No API credit is spent. The fake model calls ``search_web`` on a share of
+the user turns, so tool round trips are part of the load.
+
+Reports throughput, p50/p95/p99 latency per endpoint, the app's CPU time per
+turn (and the turns/second that leaves for a ``--cpus`` limit such as the
+0.5 CPU of docker-compose.production.yml) and its memory per session.
+Memory and CPU are read from /proc, so those figures are Linux only.
+
+Usage:
+    python benchmarks/load_test.py                                # 1000 conversations x 4 turns
+    python benchmarks/load_test.py --conversations 3000 --llm-latency 1.2
+    python benchmarks/load_test.py --app-env AGENT_MAX_CONCURRENCY=32
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, Optional
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = {"legacy": "/chat", "v1": "/api/v1/chat/"}
+
+# Each conversation follows one script; greetings and plain price questions
+# are answered by the templates/fast path, the rest by the agent
+SCRIPTS = [
+    ["Oi, bom dia!", "Tenho um Onix 2019, quanto custa o polimento?",
+     "Vocês conseguem tirar os riscos da porta?", "Quero agendar pelo WhatsApp pra sábado de manhã"],
+    ["Olá", "Quanto sai a vitrificação pra uma Hilux 2021?",
+     "Quanto tempo dura a vitrificação?", "Pode ser pelo sistema mesmo"],
+    ["Boa tarde! Meu Compass 2022 tá bem sujo por dentro", "Vocês fazem higienização dos bancos?",
+     "Qual a diferença entre a Premium e a Master?", "Fechado, vou agendar pelo site"],
+    ["Vocês atendem em Aracaju?", "Qual o endereço de vocês?",
+     "Quanto custa a lavagem Preventiva num HB20?", "Obrigado!"],
+]
+
+MODEL_REPLIES = [
+    "Show! Pro seu carro eu recomendo o Polimento, que tira os riscos superficiais e devolve o brilho.",
+    "Perfeito! É super rápido por lá: https://www.vanluagendamento.online/ no nosso sistema",
+    "A Vitrificação protege a pintura por até 3 anos. Qual o modelo e o ano do seu carro?",
+    "Fechado! Ficou agendado para sábado às 9h. Te espero lá!",
+]
+
+# Fake providers
+
+def latency_sampler(rng: random.Random, median: float, sigma: float) -> Callable[[], float]:
+    """Log-normal latencies with the given median (seconds)"""
+    if median <= 0:
+        return lambda: 0.0
+    return lambda: rng.lognormvariate(math.log(median), sigma)
+
+def _completion_message(payload: Dict, rng: random.Random, tool_rate: float) -> Dict:
+    last = payload["messages"][-1]
+    has_search = any(tool["function"]["name"] == "search_web" for tool in payload.get("tools") or [])
+    if last["role"] == "user" and has_search and rng.random() < tool_rate:
+        arguments = json.dumps({"query": f"Vanlu estética automotiva {last['content']}"}, ensure_ascii=False)
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{"id": f"call_{uuid.uuid4().hex[:24]}", "type": "function",
+                            "function": {"name": "search_web", "arguments": arguments}}]
+        }
+    # Answers after a tool result, plain replies and history summaries
+    return {"role": "assistant", "content": rng.choice(MODEL_REPLIES)}
+
+def build_fakes(llm_latency: float, llm_sigma: float, search_latency: float, search_sigma: float,
+                tool_rate: float, seed: int) -> FastAPI:
+    """OpenAI chat completions and Tavily search stand-ins"""
+    rng = random.Random(seed)
+    llm_delay = latency_sampler(rng, llm_latency, llm_sigma)
+    search_delay = latency_sampler(rng, search_latency, search_sigma)
+    app = FastAPI()
+    app.state.calls = Counter()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        message = _completion_message(payload, rng, tool_rate)
+        app.state.calls["chat_completions"] += 1
+        if message.get("tool_calls"):
+            app.state.calls["tool_calls"] += 1
+        await asyncio.sleep(llm_delay())
+
+        finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+        common = {"id": f"chatcmpl-{uuid.uuid4().hex}", "created": int(time.time()), "model": payload["model"]}
+        if payload.get("stream"):
+            delta = dict(message)
+            if "tool_calls" in delta:
+                delta["tool_calls"] = [dict(call, index=0) for call in delta["tool_calls"]]
+            chunks = [
+                {**common, "object": "chat.completion.chunk",
+                 "choices": [{"index": 0, "delta": delta, "finish_reason": None}]},
+                {**common, "object": "chat.completion.chunk",
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]},
+            ]
+
+            async def events():
+                for chunk in chunks:
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        prompt_tokens = len(json.dumps(payload["messages"])) // 4
+        completion_tokens = len(message.get("content") or "") // 4 + 10
+        return {
+            **common,
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}
+        }
+
+    @app.post("/search")
+    async def search(request: Request):
+        payload = await request.json()
+        app.state.calls["searches"] += 1
+        await asyncio.sleep(search_delay())
+        return {
+            "query": payload["query"],
+            "results": [
+                {"title": f"Resultado {i + 1} - Estética automotiva", "url": f"https://example.com/{i + 1}",
+                 "content": "Polimento, vitrificação e higienização com preços a partir de R$ 120,00.",
+                 "score": round(0.9 - i * 0.1, 2)}
+                for i in range(payload.get("max_results", 3))
+            ]
+        }
+
+    @app.get("/calls")
+    async def calls():
+        return dict(app.state.calls)
+
+    return app
+
+def serve_fakes(port: int, options: Dict):
+    uvicorn.run(build_fakes(**options), host="127.0.0.1", port=port, log_level="warning")
+
+# App process
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def read_proc_status(pid: int) -> Dict[str, int]:
+    """VmRSS/VmHWM of a process in bytes (empty outside Linux)"""
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as status_file:
+            fields = dict(line.split(":", 1) for line in status_file if line.startswith(("VmRSS", "VmHWM")))
+    except OSError:
+        return {}
+    return {name: int(value.split()[0]) * 1024 for name, value in fields.items()}
+
+def read_cpu_seconds(pid: int) -> Optional[float]:
+    """User + system CPU time of a process (None outside Linux)"""
+    try:
+        with open(f"/proc/{pid}/stat", encoding="utf-8") as stat_file:
+            # Fields after the parenthesized command name; utime and stime are 14th and 15th
+            fields = stat_file.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+def start_app(port: int, fakes_url: str, conversations: int, keep_alive: int, extra_env: List[str],
+              log_file) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "load-test",
+        "TAVILY_API_KEY": "load-test",
+        "OPENAI_BASE_URL": f"{fakes_url}/v1",
+        "TAVILY_API_URL": fakes_url,
+        "LANGCHAIN_TRACING_V2": "false",
+        "LANGSMITH_TRACING": "false",
+        # Competitor refreshes would scrape real sites through Firecrawl
+        "COMPETITOR_REFRESH_INTERVAL": "0",
+        # Every conversation keeps its session for the memory figure
+        "MAX_SESSIONS": str(max(1000, conversations * 2)),
+    })
+    env.update(item.split("=", 1) for item in extra_env)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--timeout-keep-alive", str(keep_alive)],
+        cwd=ROOT, env=env, stdout=log_file, stderr=subprocess.STDOUT
+    )
+
+async def wait_ready(client: httpx.AsyncClient, process: subprocess.Popen, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited with status {process.returncode}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"App not ready after {timeout}s")
+
+# Load
+
+class Recorder:
+    """Per-endpoint turn latencies and failures"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+
+    def record(self, endpoint: str, seconds: float, error: Optional[str]):
+        self.latencies[endpoint].append(seconds)
+        if error:
+            self.errors[error] += 1
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+
+    def at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)] * 1000, 1)
+
+    return {"p50_ms": at(0.50), "p95_ms": at(0.95), "p99_ms": at(0.99), "max_ms": round(ordered[-1] * 1000, 1)}
+
+async def converse(client: httpx.AsyncClient, index: int, endpoint: str, turns: int, think_time: float,
+                   start_delay: float, rng: random.Random, recorder: Recorder):
+    await asyncio.sleep(start_delay)
+    script = SCRIPTS[index % len(SCRIPTS)]
+    session_id = f"load_{index}"
+    for turn in range(turns):
+        started = time.perf_counter()
+        error = None
+        try:
+            response = await client.post(endpoint, json={"message": script[turn % len(script)], "session_id": session_id})
+            if response.status_code != 200:
+                error = f"HTTP {response.status_code}"
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        recorder.record(endpoint, time.perf_counter() - started, error)
+        if turn < turns - 1:
+            await asyncio.sleep(rng.uniform(0, 2 * think_time))
+
+async def run(args) -> Dict:
+    fakes_port, app_port = free_port(), free_port()
+    fakes_url = f"http://127.0.0.1:{fakes_port}"
+    fakes = multiprocessing.Process(target=serve_fakes, args=(fakes_port, {
+        "llm_latency": args.llm_latency, "llm_sigma": args.llm_sigma,
+        "search_latency": args.search_latency, "search_sigma": args.search_sigma,
+        "tool_rate": args.tool_rate, "seed": args.seed
+    }), daemon=True)
+    fakes.start()
+
+    log_file = tempfile.NamedTemporaryFile("w", prefix="vanlu-load-test-", suffix=".log", delete=False)
+    # Idle connections must outlive the longest pause plus event loop lag under load, or the
+    # server closes a connection the client has just sent its next turn on
+    keep_alive = math.ceil(2 * args.think_time) + 60
+    app = start_app(app_port, fakes_url, args.conversations, keep_alive, args.app_env, log_file)
+    endpoints = [ENDPOINTS[args.endpoint]] if args.endpoint in ENDPOINTS else list(ENDPOINTS.values())
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+
+    limits = httpx.Limits(max_connections=args.conversations, max_keepalive_connections=args.conversations)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", limits=limits,
+                                     timeout=args.timeout) as client:
+            await wait_ready(client, app)
+            # Warm up lazy imports and caches so they don't count as per-session memory
+            for endpoint in endpoints:
+                await converse(client, -1, endpoint, len(SCRIPTS[0]), 0, 0, rng, Recorder())
+
+            rss_before = read_proc_status(app.pid).get("VmRSS")
+            cpu_before = read_cpu_seconds(app.pid)
+            client_cpu_before = time.process_time()
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                converse(client, i, endpoints[i % len(endpoints)], args.turns, args.think_time,
+                         args.ramp_up * i / args.conversations, rng, recorder)
+                for i in range(args.conversations)
+            ))
+            elapsed = time.perf_counter() - started
+            client_cpu_seconds = time.process_time() - client_cpu_before
+            cpu_after = read_cpu_seconds(app.pid)
+            memory = read_proc_status(app.pid)
+            app_stats = (await client.get("/stats")).json()
+
+        async with httpx.AsyncClient(base_url=fakes_url) as client:
+            provider_calls = (await client.get("/calls")).json()
+    finally:
+        app.terminate()
+        try:
+            app.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            app.kill()
+        fakes.terminate()
+        log_file.close()
+
+    all_latencies = [seconds for values in recorder.latencies.values() for seconds in values]
+    turns = len(all_latencies)
+    errors = sum(recorder.errors.values())
+    cpu_seconds = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+    cpu_per_turn = cpu_seconds / turns if cpu_seconds is not None and turns else None
+
+    return {
+        "config": {
+            "conversations": args.conversations,
+            "turns_per_conversation": args.turns,
+            "think_time_seconds": args.think_time,
+            "ramp_up_seconds": args.ramp_up,
+            "llm_latency_median_seconds": args.llm_latency,
+            "search_latency_median_seconds": args.search_latency,
+            "tool_rate": args.tool_rate,
+            "app_env": args.app_env
+        },
+        "turns": turns,
+        "errors": errors,
+        "error_rate": round(errors / turns, 4) if turns else 0.0,
+        "error_kinds": dict(recorder.errors),
+        "seconds": round(elapsed, 2),
+        "turns_per_second": round(turns / elapsed, 1),
+        "latency": {
+            "all": percentiles(all_latencies),
+            **{endpoint: percentiles(values) for endpoint, values in recorder.latencies.items()}
+        },
+        "cpu": {
+            "app_cpu_seconds": round(cpu_seconds, 2) if cpu_seconds is not None else None,
+            "app_cpu_ms_per_turn": round(cpu_per_turn * 1000, 2) if cpu_per_turn else None,
+            "average_cores_used": round(cpu_seconds / elapsed, 2) if cpu_seconds is not None else None,
+            # Near 1.0 means the load generator, not the app, was the bottleneck
+            "client_cores_used": round(client_cpu_seconds / elapsed, 2),
+            # Turns/second the app can sustain before a CPU limit of --cpus saturates
+            f"max_turns_per_second_at_{args.cpus}_cpus": round(args.cpus / cpu_per_turn, 1) if cpu_per_turn else None
+        },
+        "memory": {
+            "rss_before_mb": round(rss_before / 2 ** 20, 1) if rss_before else None,
+            "rss_after_mb": round(memory["VmRSS"] / 2 ** 20, 1) if memory else None,
+            "peak_rss_mb": round(memory["VmHWM"] / 2 ** 20, 1) if memory else None,
+            "kb_per_session": round((memory["VmRSS"] - rss_before) / 1024 / args.conversations, 1)
+                              if memory and rss_before else None
+        },
+        "provider_calls": provider_calls,
+        "app": {key: app_stats.get(key) for key in ("agent", "fast_path", "templates")},
+        "app_log": log_file.name
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=4, help="Turns per conversation")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean pause between a conversation's turns (s)")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="Seconds over which conversations start")
+    parser.add_argument("--endpoint", choices=["both", "legacy", "v1"], default="both")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="Median fake OpenAI latency (s)")
+    parser.add_argument("--llm-sigma", type=float, default=0.4, help="Log-normal sigma of the OpenAI latency")
+    parser.add_argument("--search-latency", type=float, default=0.6, help="Median fake Tavily latency (s)")
+    parser.add_argument("--search-sigma", type=float, default=0.3)
+    parser.add_argument("--tool-rate", type=float, default=0.3, help="Share of user turns that call search_web")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Client timeout per turn (s)")
+    parser.add_argument("--cpus", type=float, default=0.5, help="CPU limit for the capacity estimate")
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the app (repeatable)")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    try:
+        import resource
+        # Every concurrent conversation holds a connection on both ends
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        wanted = args.conversations * 2 + 1024
+        if soft < wanted:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (wanted if hard == resource.RLIM_INFINITY else min(wanted, hard), hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+    if result["error_rate"] > args.max_error_rate:
+        print(f"Error rate {result['error_rate']} above {args.max_error_rate}; see {result['app_log']}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
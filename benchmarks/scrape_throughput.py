@@ -0,0 +1,127 @@
+"""
+Throughput check for Firecrawl scraping
+
+Starts a local stub of the Firecrawl v1 ``/scrape`` endpoint (fixed page
+latency, a share of transient 503s) and scrapes a batch of URLs spread over a
+few sites through WebScrapingService. Reports pages/second and retries, and
+verifies that no site ever saw more than ``--per-host`` concurrent scrapes
+and that every page eventually succeeded.
+
+Usage: python benchmarks/scrape_throughput.py [--pages 200] [--hosts 5] [--per-host 4]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from http_clients import open_http_pool
+from models import ScrapeRequest
+from services import WebScrapingService
+
+def build_stub(latency: float, fail_every: int):
+    """Firecrawl stand-in that records per-site concurrency"""
+    app = FastAPI()
+    app.state.in_flight = Counter()
+    app.state.peak = Counter()
+    app.state.attempts = Counter()
+
+    @app.post("/v1/scrape")
+    async def scrape(request: Request):
+        payload = await request.json()
+        url, host = payload["url"], urlparse(payload["url"]).netloc
+        app.state.attempts[url] += 1
+        # Every ``fail_every``-th page fails on its first attempt
+        if fail_every and app.state.attempts[url] == 1 and int(url.rsplit("/", 1)[1]) % fail_every == 0:
+            return JSONResponse({"success": False, "error": "Service unavailable"}, status_code=503)
+
+        app.state.in_flight[host] += 1
+        app.state.peak[host] = max(app.state.peak[host], app.state.in_flight[host])
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            app.state.in_flight[host] -= 1
+        data = {fmt: f"# {url}\n\nConteúdo da página" for fmt in payload["formats"]}
+        data["metadata"] = {"sourceURL": url, "statusCode": 200,
+                            "onlyMainContent": payload["onlyMainContent"], "waitFor": payload.get("waitFor")}
+        return {"success": True, "data": data}
+
+    return app
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def run(pages: int, hosts: int, per_host: int, latency: float, fail_every: int) -> dict:
+    stub = build_stub(latency, fail_every)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    try:
+        async with open_http_pool(max_connections_per_host=hosts * per_host):
+            service = WebScrapingService(
+                api_key="stub", base_url=f"http://127.0.0.1:{port}/v1", max_concurrency_per_host=per_host
+            )
+            # max_age=0: measure scraping, not the scrape cache
+            requests = [
+                ScrapeRequest(url=f"https://site{i % hosts}.example.com/page/{i}", formats=["markdown"], wait_for=500,
+                              max_age=0)
+                for i in range(pages)
+            ]
+
+            start = time.perf_counter()
+            results = await asyncio.gather(*(service.scrape_url(request) for request in requests))
+            elapsed = time.perf_counter() - start
+    finally:
+        server.should_exit = True
+        await server_task
+
+    return {
+        "pages": pages,
+        "hosts": hosts,
+        "max_concurrency_per_host": per_host,
+        "page_latency_seconds": latency,
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(pages / elapsed, 1),
+        "succeeded": sum(1 for result in results if result.success),
+        "peak_concurrency_per_host": max(stub.state.peak.values()),
+        "honored_options": all(result.metadata["waitFor"] == 500 for result in results),
+        "scraping": service.get_stats()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--hosts", type=int, default=5)
+    parser.add_argument("--per-host", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--fail-every", type=int, default=10)
+    args = parser.parse_args()
+
+    # The stub's 503s are expected; keep the retry warnings out of the report
+    logging.getLogger("services").setLevel(logging.ERROR)
+    result = asyncio.run(run(args.pages, args.hosts, args.per_host, args.latency, args.fail_every))
+    print(json.dumps(result, indent=2))
+
+    if (result["succeeded"] < args.pages or result["peak_concurrency_per_host"] > args.per_host
+            or not result["honored_options"]):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+LangGraph checkpointer factory for Vanlu API
+
+With a checkpointer attached to the agent graph the conversation history lives
+once, inside the graph state keyed by ``thread_id``, and each chat turn only
+sends the new HumanMessage.
+
+The stock savers keep every superstep checkpoint (and, in memory, a copy of
+the ``messages`` blob per channel version), so a session's footprint grows
+quadratically with its length. The API never reads old checkpoints, so the
+savers returned here keep only the latest checkpoint of each thread.
+"""
+
+import contextlib
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINTER_BACKENDS = ("none", "memory", "sqlite")
+
+class LatestCheckpointSaver(InMemorySaver):
+    """In-memory saver that drops a thread's older checkpoints, writes and blobs on each put"""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        # (thread_id, checkpoint_ns) -> (checkpoint_id, channel_versions) of the kept checkpoint
+        self._latest: Dict[Tuple[str, str], Tuple[str, Dict[str, Any]]] = {}
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        versions = dict(checkpoint["channel_versions"])
+        previous = self._latest.get((thread_id, checkpoint_ns))
+        self._latest[(thread_id, checkpoint_ns)] = (checkpoint["id"], versions)
+
+        if previous is not None and previous[0] != checkpoint["id"]:
+            previous_id, previous_versions = previous
+            self.storage[thread_id][checkpoint_ns].pop(previous_id, None)
+            self.writes.pop((thread_id, checkpoint_ns, previous_id), None)
+            for channel, version in previous_versions.items():
+                if versions.get(channel) != version:
+                    self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+        return next_config
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        for key in [key for key in self._latest if key[0] == thread_id]:
+            del self._latest[key]
+
+def _latest_sqlite_saver_class():
+    # Optional dependency: langgraph-checkpoint-sqlite (aiosqlite)
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    class LatestCheckpointSqliteSaver(AsyncSqliteSaver):
+        """SQLite saver that deletes a thread's older checkpoints and writes on each put"""
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            next_config = await super().aput(config, checkpoint, metadata, new_versions)
+            key = (str(config["configurable"]["thread_id"]), config["configurable"].get("checkpoint_ns", ""), checkpoint["id"])
+            async with self.lock:
+                await self.conn.execute(
+                    "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id != ?", key
+                )
+                await self.conn.execute(
+                    "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id != ?", key
+                )
+                await self.conn.commit()
+            return next_config
+
+    return LatestCheckpointSqliteSaver
+
+@contextlib.asynccontextmanager
+async def open_checkpointer(backend: str = "memory", db_path: str = "data/checkpoints.sqlite") -> AsyncIterator[Optional[object]]:
+    """Open the configured checkpointer for the lifetime of the app
+
+    ``none`` keeps the legacy behaviour (no checkpointer, full history sent
+    every turn), ``memory`` keeps threads in process memory and ``sqlite``
+    persists them to a local SQLite file. Both keep one checkpoint per thread.
+    """
+    if backend not in CHECKPOINTER_BACKENDS:
+        raise ValueError(f"Unknown checkpointer backend: {backend}")
+
+    if backend == "none":
+        yield None
+        return
+
+    if backend == "memory":
+        logger.info("Using in-memory checkpointer")
+        yield LatestCheckpointSaver()
+        return
+
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+
+    async with _latest_sqlite_saver_class().from_conn_string(db_path) as saver:
+        await saver.setup()
+        logger.info(f"Using SQLite checkpointer at {db_path}")
+        yield saver
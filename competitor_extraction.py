@@ -0,0 +1,185 @@
+"""
+Rule-based extraction of services, prices and contacts from competitor pages
+
+Scraped markdown is scanned with compiled patterns: BRL prices ("R$ 1.200,00"),
+Brazilian phone numbers, WhatsApp links and e-mails, plus one alternation
+regex mapping competitors' wording onto our ``ServiceType`` vocabulary. A
+price is attributed to the service named on the same line or, failing that,
+in the few lines above it (the usual "## Polimento" heading + price list).
+No LLM call is needed per page.
+
+Results are cached by a hash of the page content, so re-analyzing a page
+that hasn't changed doesn't parse it again.
+"""
+
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import xxhash
+
+from models import ServiceType
+from text_folding import fold
+
+# Competitor wording per service, written folded (lowercase, no accents)
+SERVICE_VOCABULARY: Dict[ServiceType, List[str]] = {
+    ServiceType.HIGIENIZACAO: ["higienizacao", "higienizar", "hidratacao de couro", "lavagem de bancos",
+                               "limpeza de bancos", "estofado"],
+    ServiceType.INTERNA: ["limpeza interna", "lavagem interna", "aspiracao", "limpeza de interior"],
+    ServiceType.VITRIFICACAO: ["vitrificacao", "vitrificar", "ceramic", "coating"],
+    ServiceType.POLIMENTO: ["polimento", "polir", "espelhamento", "cristalizacao", "remocao de riscos"],
+    ServiceType.MASTER: ["detalhamento", "detalhada", "revitalizacao"],
+    ServiceType.PREMIUM: ["lavagem completa", "lavagem premium", "lavagem tecnica"],
+    ServiceType.PREVENTIVA: ["lavagem simples", "lavagem basica", "lavagem tradicional", "lavagem rapida",
+                             "lavagem externa", "ducha"]
+}
+
+# Prices outside this range are installment counts, years or typos
+MIN_PRICE, MAX_PRICE = 10.0, 20000.0
+
+# Lines above a price that can still name its service
+CONTEXT_LINES = 3
+
+_PRICE = re.compile(r"R\$\s*(\d{1,3}(?:\.\d{3})+|\d+)(?:,(\d{2}))?")
+# "12x de R$ 40" is an installment, not a price
+_INSTALLMENT = re.compile(r"\d+\s*x\s*(?:de\s*)?$", re.IGNORECASE)
+_PHONE = re.compile(r"(?<![\d/])(?:\+?55[\s.-]?)?\(?([1-9]\d)\)?[\s.-]?(9?\d{4})[\s.-]?(\d{4})(?![\d/])")
+_WHATSAPP = re.compile(r"(?:wa\.me/|whatsapp\.com/send/?\?phone=)\+?(\d{10,13})", re.IGNORECASE)
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_GROUP_NAMES = {f"s{index}": service for index, service in enumerate(SERVICE_VOCABULARY)}
+_SERVICE = re.compile(r"\b(?:" + "|".join(
+    f"(?P<s{index}>" + "|".join(re.escape(word) for word in sorted(words, key=len, reverse=True)) + ")"
+    for index, words in enumerate(SERVICE_VOCABULARY.values())
+) + ")")
+
+def _parse_price(match: re.Match) -> float:
+    return float(match.group(1).replace(".", "") + "." + (match.group(2) or "00"))
+
+def _format_phone(ddd: str, prefix: str, suffix: str) -> str:
+    return f"({ddd}) {prefix}-{suffix}"
+
+@dataclass(frozen=True)
+class PageExtraction:
+    services: Tuple[str, ...]
+    price_ranges: Dict[str, Dict[str, Any]]
+    contact_info: Dict[str, List[str]]
+
+class CompetitorExtractor:
+    """Compiled-pattern extractor with a content-hash result cache"""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, PageExtraction]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def extract(self, markdown: str) -> PageExtraction:
+        """Services, price ranges and contacts of a page (cached by content hash)"""
+        key = xxhash.xxh3_64_hexdigest(markdown.encode("utf-8"))
+        extraction = self._cache.get(key)
+        if extraction is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return extraction
+
+        self.misses += 1
+        extraction = self._extract(markdown)
+        self._cache[key] = extraction
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return extraction
+
+    def _extract(self, markdown: str) -> PageExtraction:
+        services: Dict[str, None] = {}
+        prices: Dict[str, List[float]] = {}
+        context: Optional[str] = None
+        context_age = CONTEXT_LINES + 1
+
+        for line in markdown.splitlines():
+            # fold() keeps string length, so offsets line up with the original line
+            mentions = [(match.start(), _GROUP_NAMES[match.lastgroup].value) for match in _SERVICE.finditer(fold(line))]
+            for _, service in mentions:
+                services.setdefault(service)
+
+            for match in _PRICE.finditer(line):
+                price = _parse_price(match)
+                if not MIN_PRICE <= price <= MAX_PRICE or _INSTALLMENT.search(line, 0, match.start()):
+                    continue
+                # Service mentioned closest before the price on this line, else the one above
+                before = [service for offset, service in mentions if offset < match.start()]
+                if before:
+                    service = before[-1]
+                elif mentions:
+                    service = mentions[0][1]
+                elif context_age <= CONTEXT_LINES:
+                    service = context
+                else:
+                    service = "Outros"
+                prices.setdefault(service, []).append(price)
+
+            if mentions:
+                context, context_age = mentions[-1][1], 0
+            elif line.strip():
+                context_age += 1
+
+        price_ranges = {
+            service: {"min": min(values), "max": max(values), "samples": len(values)}
+            for service, values in prices.items()
+        }
+        return PageExtraction(
+            services=tuple(services),
+            price_ranges=price_ranges,
+            contact_info=self._contacts(markdown)
+        )
+
+    @staticmethod
+    def _contacts(markdown: str) -> Dict[str, List[str]]:
+        whatsapp = list(dict.fromkeys(_WHATSAPP.findall(markdown)))
+        # Numbers inside WhatsApp links are reported as WhatsApp only
+        text = _WHATSAPP.sub(" ", markdown)
+        phones = list(dict.fromkeys(_format_phone(*match) for match in _PHONE.findall(text)))
+        emails = list(dict.fromkeys(email.lower() for email in _EMAIL.findall(text)))
+        return {"phones": phones, "whatsapp": whatsapp, "emails": emails}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0.0
+        }
+
+_TITLE_SEPARATORS = re.compile(r"\s+[|\-–—:]\s+")
+
+def competitor_name(url: str, metadata: Optional[Dict[str, Any]]) -> str:
+    """Business name from the page title, or the site's host"""
+    title = (metadata or {}).get("ogSiteName") or (metadata or {}).get("title") or ""
+    name = _TITLE_SEPARATORS.split(title.strip())[0].strip() if title else ""
+    if name:
+        return name
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+def assess(extraction: PageExtraction) -> Tuple[List[str], List[str]]:
+    """Strengths and weaknesses visible on the site"""
+    strengths, weaknesses = [], []
+    contacts = extraction.contact_info
+
+    if extraction.price_ranges:
+        strengths.append("Preços publicados no site")
+    else:
+        weaknesses.append("Sem preços no site")
+    if contacts["whatsapp"]:
+        strengths.append("Atendimento por WhatsApp")
+    if not (contacts["phones"] or contacts["whatsapp"]):
+        weaknesses.append("Sem telefone ou WhatsApp no site")
+    if len(extraction.services) >= 5:
+        strengths.append("Catálogo de serviços amplo")
+    elif len(extraction.services) <= 2:
+        weaknesses.append("Poucos serviços divulgados")
+    return strengths, weaknesses
@@ -0,0 +1,314 @@
+"""
+Stale-while-revalidate snapshots of competitor intelligence per location
+
+A snapshot holds a location's competitor list (Tavily search) and the
+analysis of each competitor's site. A refresh only waits for the search;
+the sites are analyzed afterwards in the background and filled into the
+snapshot (keeping the previous analyses of competitors still listed until
+then), so the first request for a new location doesn't wait for every
+scrape. Reads are served from the snapshot right away; once it is older
+than ``max_age`` a background refresh is started and the stale snapshot
+keeps being served until it finishes. An opt-in scheduler also refreshes
+the configured locations every ``refresh_interval`` seconds, so the first
+request of the day doesn't pay for it. A failed refresh keeps the previous snapshot, and stale reads don't
+retry it for ``retry_after`` seconds.
+
+Snapshots are optionally saved to a JSON file and reloaded at startup.
+The scheduler needs a snapshot file: with several uvicorn workers only the
+one holding an exclusive lock on ``<path>.lock`` runs it. Before rebuilding a stale or
+missing snapshot, a worker first reloads the file if another process has
+written it since, and saves merge per location, keeping the newest.
+"""
+
+import asyncio
+import fcntl
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import orjson
+
+from coalescing import AsyncSingleFlight
+from text_folding import fold
+
+logger = logging.getLogger(__name__)
+
+def normalize_location(location: str) -> str:
+    """Snapshot key of a location ("Aracaju", " aracajú " -> "aracaju")"""
+    return " ".join(fold(location).split())
+
+@dataclass
+class CompetitorSnapshot:
+    location: str
+    competitors: List[Dict[str, Any]]
+    # competitor URL -> CompetitorAnalysis as a dict
+    analyses: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    refreshed_at: float = field(default_factory=time.time)
+    refresh_seconds: float = 0.0
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.refreshed_at
+
+class CompetitorSnapshotStore:
+    """Per-location snapshots with background and scheduled refresh"""
+
+    def __init__(
+        self,
+        build: Callable[[str], Awaitable[CompetitorSnapshot]],
+        analyze: Optional[Callable[[CompetitorSnapshot], Awaitable[Dict[str, Dict[str, Any]]]]] = None,
+        max_age: float = 86400,
+        refresh_interval: float = 86400,
+        locations: Optional[List[str]] = None,
+        path: Optional[str] = None,
+        scheduler_enabled: bool = False,
+        retry_after: float = 600
+    ):
+        self.build = build
+        self.analyze = analyze
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        self.locations = list(locations or [])
+        self.path = path
+        self.scheduler_enabled = scheduler_enabled
+        self.retry_after = retry_after
+        self._scheduler_lock = None
+        self._snapshots: Dict[str, CompetitorSnapshot] = {}
+        # Location key -> time of its last failed refresh
+        self._failed_at: Dict[str, float] = {}
+        # mtime of the snapshot file as last read or written by this process
+        self._file_mtime = 0.0
+        # One refresh per location at a time, however many readers trigger it
+        self._flight = AsyncSingleFlight()
+        self._background: Set[asyncio.Task] = set()
+        self._scheduler: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.stale_served = 0
+        self.last_error: Optional[str] = None
+        self._load()
+
+    def _read(self) -> Optional[Tuple[float, Dict[str, CompetitorSnapshot]]]:
+        """(mtime, snapshots) of the snapshot file, None if there is none"""
+        if not self.path:
+            return None
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path, "rb") as snapshot_file:
+                data = orjson.loads(snapshot_file.read())
+            return mtime, {key: CompetitorSnapshot(**snapshot) for key, snapshot in data.items()}
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Could not load competitor snapshots from {self.path}: {str(e)}")
+            return None
+
+    def _merge(self, mtime: float, snapshots: Dict[str, CompetitorSnapshot]) -> int:
+        """Take the snapshots newer than ours, returning how many were taken"""
+        self._file_mtime = max(self._file_mtime, mtime)
+        taken = 0
+        for key, snapshot in snapshots.items():
+            current = self._snapshots.get(key)
+            if current is None or snapshot.refreshed_at > current.refreshed_at:
+                self._snapshots[key] = snapshot
+                taken += 1
+        return taken
+
+    def _load(self):
+        loaded = self._read()
+        if loaded is not None:
+            self._merge(*loaded)
+            logger.info(f"Loaded {len(self._snapshots)} competitor snapshots from {self.path}")
+
+    async def _reload_if_changed(self) -> bool:
+        """Merge the snapshot file if another process wrote it since we last did"""
+        if not self.path:
+            return False
+        try:
+            if os.stat(self.path).st_mtime <= self._file_mtime:
+                return False
+        except OSError:
+            return False
+        loaded = await asyncio.to_thread(self._read)
+        return loaded is not None and self._merge(*loaded) > 0
+
+    def _save(self, snapshots: Dict[str, CompetitorSnapshot]) -> float:
+        """Write our snapshots merged with newer ones on disk; returns the file's mtime"""
+        snapshot_dir = os.path.dirname(self.path)
+        if snapshot_dir:
+            os.makedirs(snapshot_dir, exist_ok=True)
+        merged = dict(snapshots)
+        on_disk = self._read()
+        if on_disk is not None:
+            for key, snapshot in on_disk[1].items():
+                if key not in merged or snapshot.refreshed_at > merged[key].refreshed_at:
+                    merged[key] = snapshot
+        # Per-process temp file: other workers may be saving at the same time
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as snapshot_file:
+            snapshot_file.write(orjson.dumps({key: asdict(snapshot) for key, snapshot in merged.items()}))
+        os.replace(tmp_path, self.path)
+        return os.stat(self.path).st_mtime
+
+    async def refresh(self, location: str) -> CompetitorSnapshot:
+        """Rebuild a location's snapshot (concurrent calls share one rebuild)"""
+        key = normalize_location(location)
+
+        async def rebuild() -> CompetitorSnapshot:
+            started = time.perf_counter()
+            try:
+                snapshot = await self.build(location)
+            except Exception as e:
+                self.refresh_errors += 1
+                self.last_error = str(e)
+                self._failed_at[key] = time.time()
+                logger.error(f"Error refreshing competitor snapshot for {location}: {str(e)}")
+                raise
+            snapshot.refresh_seconds = round(time.perf_counter() - started, 3)
+            previous = self._snapshots.get(key)
+            if self.analyze is not None and previous is not None:
+                urls = {competitor.get("url") for competitor in snapshot.competitors}
+                snapshot.analyses = {url: analysis for url, analysis in previous.analyses.items() if url in urls}
+            self._snapshots[key] = snapshot
+            self._failed_at.pop(key, None)
+            self.refreshes += 1
+            await self._persist()
+            logger.info(f"Refreshed competitor snapshot for {location} in {snapshot.refresh_seconds}s")
+            if self.analyze is not None:
+                self._spawn(self._analyze_snapshot(snapshot))
+            return snapshot
+
+        return await self._flight.do(key, rebuild)
+
+    async def _persist(self):
+        if not self.path:
+            return
+        try:
+            # Written in a worker thread from a copy, so the loop can keep changing the dict
+            mtime = await asyncio.to_thread(self._save, dict(self._snapshots))
+            self._file_mtime = max(self._file_mtime, mtime)
+        except OSError as e:
+            # The snapshots are still served from memory
+            logger.warning(f"Could not save competitor snapshots to {self.path}: {str(e)}")
+
+    async def _analyze_snapshot(self, snapshot: CompetitorSnapshot):
+        started = time.perf_counter()
+        try:
+            analyses = await self.analyze(snapshot)
+        except Exception as e:
+            logger.error(f"Error analyzing competitors for {snapshot.location}: {str(e)}")
+            return
+        snapshot.analyses = analyses
+        await self._persist()
+        logger.info(f"Analyzed {len(analyses)} competitor sites for {snapshot.location} in "
+                    f"{time.perf_counter() - started:.1f}s")
+
+    def _spawn(self, coroutine: Awaitable[Any]):
+        task = asyncio.ensure_future(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._on_background_done)
+
+    def _refresh_in_background(self, location: str):
+        self._spawn(self.refresh(location))
+
+    def _on_background_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled():
+            # Already counted and logged by refresh(); retrieve it so asyncio doesn't warn
+            task.exception()
+
+    async def get(self, location: str) -> CompetitorSnapshot:
+        """Snapshot for a location; stale ones are returned at once and refreshed in the background"""
+        key = normalize_location(location)
+        snapshot = self._snapshots.get(key)
+        if (snapshot is None or snapshot.age > self.max_age) and await self._reload_if_changed():
+            # Another worker (e.g. the scheduler's) refreshed it
+            snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            # Nothing to serve yet: the first reader waits for the build
+            return await self.refresh(location)
+        if snapshot.age > self.max_age:
+            self.stale_served += 1
+            if time.time() - self._failed_at.get(key, 0.0) >= self.retry_after:
+                self._refresh_in_background(location)
+        return snapshot
+
+    async def _run_scheduler(self):
+        while True:
+            for location in self.locations:
+                snapshot = self._snapshots.get(normalize_location(location))
+                # Snapshots loaded from disk may still be fresh
+                if snapshot is None or snapshot.age >= self.refresh_interval:
+                    try:
+                        await self.refresh(location)
+                    except Exception:
+                        # Logged by refresh(); try again on the next round
+                        pass
+            await asyncio.sleep(min(self.refresh_interval, 3600))
+
+    def _acquire_scheduler_lock(self) -> bool:
+        lock_dir = os.path.dirname(self.path)
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+        lock_file = open(f"{self.path}.lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._scheduler_lock = lock_file
+        return True
+
+    def _release_scheduler_lock(self):
+        if self._scheduler_lock is not None:
+            # Closing the file drops the flock
+            self._scheduler_lock.close()
+            self._scheduler_lock = None
+
+    def start(self):
+        """Start the scheduled refresh of the configured locations (one worker per snapshot file)"""
+        if self._scheduler is not None or not self.scheduler_enabled or not self.locations or self.refresh_interval <= 0:
+            return
+        if not self.path:
+            # Without a file there is no lock, so every worker would run its own scheduler
+            logger.warning("Competitor scheduler needs a snapshot path; not starting it")
+            return
+        if not self._acquire_scheduler_lock():
+            logger.info(f"Competitor scheduler already running in another worker ({self.path}.lock)")
+            return
+        self._scheduler = asyncio.create_task(self._run_scheduler())
+
+    async def stop(self):
+        """Stop the scheduler and pending refreshes"""
+        tasks = list(self._background)
+        if self._scheduler is not None:
+            tasks.append(self._scheduler)
+            self._scheduler = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._release_scheduler_lock()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get snapshot ages and refresh counters"""
+        return {
+            "max_age": self.max_age,
+            "refresh_interval": self.refresh_interval,
+            "scheduler_running": self._scheduler is not None,
+            "snapshots": {
+                key: {
+                    "competitors": len(snapshot.competitors),
+                    "analyses": len(snapshot.analyses),
+                    "age_seconds": round(snapshot.age, 1),
+                    "refresh_seconds": snapshot.refresh_seconds
+                }
+                for key, snapshot in self._snapshots.items()
+            },
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "stale_served": self.stale_served,
+            "refreshing": len(self._background),
+            "last_error": self.last_error
+        }
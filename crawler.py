@@ -0,0 +1,210 @@
+"""
+Background crawl jobs on top of single-page scrapes
+
+A crawl starts from one URL, scrapes it (asking Firecrawl for its links) and
+follows same-site links breadth-first up to ``max_depth`` hops and ``limit``
+pages. Jobs run as asyncio tasks with a few workers each and at most
+``max_running_jobs`` jobs crawling at once, so the request that starts a
+crawl returns immediately with a ``crawl_id`` to poll.
+
+Include/exclude paths are regular expressions matched against the URL path
+(as in Firecrawl), each list compiled into a single alternation. Visited URLs
+are kept as 64-bit hashes of their normalized form.
+"""
+
+import asyncio
+import logging
+import re
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from urllib.parse import urldefrag, urljoin, urlparse
+
+import xxhash
+
+from models import CrawlRequest, ScrapeRequest, ScrapeResponse
+
+logger = logging.getLogger(__name__)
+
+class PathMatcher:
+    """Compiled include/exclude path filters"""
+
+    def __init__(self, include_paths: Optional[List[str]] = None, exclude_paths: Optional[List[str]] = None):
+        self.include = self._compile(include_paths)
+        self.exclude = self._compile(exclude_paths)
+
+    @staticmethod
+    def _compile(patterns: Optional[List[str]]) -> Optional[re.Pattern]:
+        if not patterns:
+            return None
+        return re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+
+    def allows(self, path: str) -> bool:
+        """Whether a URL path passes the filters (exclusions win)"""
+        if self.exclude is not None and self.exclude.search(path):
+            return False
+        return self.include is None or self.include.search(path) is not None
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL for dedupe (no fragment, lowercase host, no trailing slash)"""
+    url, _fragment = urldefrag(url)
+    parsed = urlparse(url)
+    path = parsed.path.rstrip("/") or "/"
+    query = f"?{parsed.query}" if parsed.query else ""
+    return f"{parsed.scheme.lower()}://{parsed.netloc.lower()}{path}{query}"
+
+def url_hash(url: str) -> int:
+    return xxhash.xxh64_intdigest(normalize_url(url).encode("utf-8"))
+
+@dataclass
+class CrawlJob:
+    crawl_id: str
+    request: CrawlRequest
+    status: str = "started"
+    results: List[ScrapeResponse] = field(default_factory=list)
+    pages_failed: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+class CrawlEngine:
+    """Registry and worker pool for background crawl jobs"""
+
+    def __init__(
+        self,
+        scrape: Callable[[ScrapeRequest], Awaitable[ScrapeResponse]],
+        workers_per_job: int = 4,
+        max_running_jobs: int = 2,
+        max_jobs: int = 100
+    ):
+        self.scrape = scrape
+        self.workers_per_job = workers_per_job
+        self.max_running_jobs = max_running_jobs
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, CrawlJob]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+        self._running = asyncio.Semaphore(max_running_jobs)
+        self.pages_scraped = 0
+
+    def start(self, request: CrawlRequest) -> CrawlJob:
+        """Register a crawl and run it in the background"""
+        job = CrawlJob(crawl_id=f"crawl_{uuid.uuid4().hex}", request=request)
+        self._jobs[job.crawl_id] = job
+        self._evict_finished()
+
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, crawl_id: str) -> Optional[CrawlJob]:
+        """Get a crawl job by id"""
+        return self._jobs.get(crawl_id)
+
+    def _evict_finished(self):
+        """Forget the oldest finished jobs beyond ``max_jobs``"""
+        excess = len(self._jobs) - self.max_jobs
+        for crawl_id in [crawl_id for crawl_id, job in self._jobs.items() if job.finished][:max(excess, 0)]:
+            del self._jobs[crawl_id]
+
+    def _page_request(self, request: CrawlRequest, url: str) -> ScrapeRequest:
+        options = request.scrape_options.model_dump() if request.scrape_options else {}
+        options["url"] = url
+        # Links are needed to discover the next pages
+        options["formats"] = list(dict.fromkeys(options.get("formats", ["markdown"]) + ["links"]))
+        return ScrapeRequest(**options)
+
+    async def _run(self, job: CrawlJob):
+        async with self._running:
+            job.status = "running"
+            try:
+                await self._crawl(job)
+                # A crawl that couldn't scrape even its first page failed
+                job.status = "completed" if job.results else "failed"
+            except Exception as e:
+                logger.error(f"Crawl {job.crawl_id} failed: {str(e)}")
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+
+    async def _crawl(self, job: CrawlJob):
+        request = job.request
+        root = urlparse(request.url)
+        matcher = PathMatcher(request.include_paths, request.exclude_paths)
+        visited = {url_hash(request.url)}
+        queue: "asyncio.Queue[tuple]" = asyncio.Queue()
+        queue.put_nowait((request.url, 0))
+        enqueued = 1
+
+        def follow(links: List[Any], base_url: str, depth: int):
+            nonlocal enqueued
+            if depth >= request.max_depth:
+                return
+            for link in links:
+                if enqueued >= request.limit:
+                    return
+                if not isinstance(link, str):
+                    continue
+                url = urldefrag(urljoin(base_url, link))[0]
+                parsed = urlparse(url)
+                if parsed.scheme not in ("http", "https") or parsed.netloc.lower() != root.netloc.lower():
+                    continue
+                if not matcher.allows(parsed.path or "/"):
+                    continue
+                key = url_hash(url)
+                if key in visited:
+                    continue
+                visited.add(key)
+                queue.put_nowait((url, depth + 1))
+                enqueued += 1
+
+        async def worker():
+            while True:
+                url, depth = await queue.get()
+                try:
+                    result = await self.scrape(self._page_request(request, url))
+                    if result.success:
+                        job.results.append(result)
+                        self.pages_scraped += 1
+                        follow(result.content.get("links") or [], url, depth)
+                    else:
+                        job.pages_failed += 1
+                except Exception as e:
+                    logger.warning(f"Crawl {job.crawl_id}: error scraping {url}: {str(e)}")
+                    job.pages_failed += 1
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.workers_per_job)]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def shutdown(self):
+        """Cancel running crawls"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get job and page counters"""
+        statuses: Dict[str, int] = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "jobs": statuses,
+            "max_running_jobs": self.max_running_jobs,
+            "workers_per_job": self.workers_per_job,
+            "pages_scraped": self.pages_scraped
+        }
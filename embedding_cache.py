@@ -0,0 +1,182 @@
+"""
+Content-addressed cache of text embeddings
+
+Vectors are keyed by a hash of the embedding model name and the exact text,
+so the same service description, scraped page or customer message is only
+embedded once per model. An in-memory LRU sits in front of an optional
+SQLite store that survives restarts. Lookups are batched: ``embed`` resolves
+a list of texts from memory and disk and sends every miss to the provider in
+a single call.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import xxhash
+
+logger = logging.getLogger(__name__)
+
+# SQLite's default limit of host parameters per statement is 999
+_SQL_BATCH = 500
+
+class EmbeddingCache:
+    """LRU of embedding vectors with an optional on-disk layer"""
+
+    def __init__(self, max_entries: int = 4096, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        # key -> float32 vector
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.provider_calls = 0
+        self._conn = None
+
+        if disk_path:
+            disk_dir = os.path.dirname(disk_path)
+            if disk_dir:
+                os.makedirs(disk_dir, exist_ok=True)
+            self._conn = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL)"
+            )
+
+    def make_key(self, model: str, text: str) -> str:
+        """Content address of a text under an embedding model"""
+        return xxhash.xxh3_128_hexdigest(f"{model}\x00{text}".encode("utf-8"))
+
+    def _store_locked(self, key: str, vector: np.ndarray):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.memory_bytes -= previous.nbytes
+        self._entries[key] = vector
+        self.memory_bytes += vector.nbytes
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.memory_bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def _load_from_disk_locked(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        for start in range(0, len(keys), _SQL_BATCH):
+            batch = keys[start:start + _SQL_BATCH]
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def embed(self, model: str, texts: List[str], embed_fn: Callable[[List[str]], Any]) -> np.ndarray:
+        """Embeddings of ``texts`` (one row each), calling ``embed_fn`` once for all misses"""
+        keys = [self.make_key(model, text) for text in texts]
+        vectors: Dict[str, np.ndarray] = {}
+
+        with self._lock:
+            pending = []
+            for key in dict.fromkeys(keys):
+                vector = self._entries.get(key)
+                if vector is None:
+                    pending.append(key)
+                    continue
+                self._entries.move_to_end(key)
+                vectors[key] = vector
+                self.hits += 1
+
+            if pending and self._conn is not None:
+                for key, vector in self._load_from_disk_locked(pending).items():
+                    self._store_locked(key, vector)
+                    vectors[key] = vector
+                    self.disk_hits += 1
+                pending = [key for key in pending if key not in vectors]
+            self.misses += len(pending)
+
+        if pending:
+            # One provider call per batch, outside the lock
+            text_by_key = dict(zip(keys, texts))
+            missing_texts = [text_by_key[key] for key in pending]
+            computed = np.asarray(embed_fn(missing_texts), dtype=np.float32)
+            with self._lock:
+                self.provider_calls += 1
+                for key, vector in zip(pending, computed):
+                    vector = np.ascontiguousarray(vector)
+                    self._store_locked(key, vector)
+                    vectors[key] = vector
+                if self._conn is not None:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                        [(key, model, vectors[key].tobytes()) for key in pending]
+                    )
+
+        if not keys:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([vectors[key] for key in keys])
+
+    def clear(self):
+        """Drop every cached vector"""
+        with self._lock:
+            self._entries.clear()
+            self.memory_bytes = 0
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM embeddings")
+
+    def _disk_bytes(self) -> int:
+        if not self.disk_path:
+            return 0
+        # Recent writes live in the WAL file until the next checkpoint
+        paths = (self.disk_path, f"{self.disk_path}-wal")
+        return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit ratio and memory/disk usage"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "disk_enabled": self._conn is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "provider_calls": self.provider_calls,
+            "hit_ratio": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_bytes": self.memory_bytes,
+            "disk_bytes": self._disk_bytes()
+        }
+
+class CachedEmbeddings:
+    """Embedding provider wrapper that goes through an ``EmbeddingCache``"""
+
+    def __init__(self, provider, cache: EmbeddingCache):
+        self.provider = provider
+        self.cache = cache
+        self.name = provider.name
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self.cache.embed(self.name, texts, self.provider.embed)
+
+# Process-wide cache shared by every embedding provider
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get the shared embedding cache, configured from the environment"""
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(
+                    max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "4096")),
+                    disk_path=os.getenv("EMBEDDING_CACHE_PATH") or None
+                )
+    return _embedding_cache
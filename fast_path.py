@@ -0,0 +1,150 @@
+"""
+Deterministic fast path for plain price and catalog questions
+
+Questions like "quanto custa o Premium pra Hilux?" only need a lookup in the
+pricing table, so they are answered straight from it in Luciano's reply format
+instead of a full ReAct round-trip to the LLM. Anything the router isn't
+confident about (no service or several services named, a service narrowed
+to something else like "polimento do farol", scheduling, long messages)
+falls back to the agent graph.
+"""
+
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from models import ServiceInfo, VehicleCategory
+from text_folding import fold
+from vehicle_catalog import VehicleMatch, get_vehicle_catalog
+
+# Folded (lowercase, no accents) aliases per pricing table key
+SERVICE_ALIASES = {
+    "Preventiva": ["preventiva"],
+    "Premium": ["premium"],
+    "Master": ["master"],
+    "Polimento": ["polimento"],
+    "Vitrificação": ["vitrificacao", "vitrificar"],
+    "Limpeza Interna": ["limpeza interna"],
+    "Higienização de Bancos": ["higienizacao de bancos", "higienizacao dos bancos", "higienizar os bancos"]
+}
+
+FEMININE_SERVICES = {"Preventiva", "Vitrificação", "Limpeza Interna", "Higienização de Bancos"}
+
+_SCHEDULING = re.compile(r"\b(agendar|agendamento|agenda|horario|marcar|vaga|amanha|hoje)\b")
+# "polimento do farol", "limpeza dos bancos": a part of the car the table doesn't price
+_QUALIFIER = re.compile(r"\s+(?:(?:de|do|da|dos|das|no|na|nos|nas|em)\s+(?:o |a |os |as )?(\w+)|(farol|farois|motor|rodas?|vidros?|teto|couro|painel)\b)")
+# Words after "do"/"da" that still mean the whole car
+_WHOLE_CAR = {"meu", "minha", "seu", "sua", "carro", "carros", "veiculo", "automovel", "pintura", "lataria"}
+_CATALOG = re.compile(r"\b(quais (sao )?(os )?servicos|tabela|catalogo|lista de (servicos|precos)|todos os servicos)\b")
+
+def format_brl(value: float) -> str:
+    """Format a price the Brazilian way (R$ 1.000,00)"""
+    return "R$ " + f"{value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+class FastPathRouter:
+    """Answers confident price/catalog intents from the pricing table"""
+
+    def __init__(self, service_pricing: Dict[str, ServiceInfo], detect_intent: Callable[[str], str],
+                 max_words: int = 25, catalog_options: int = 3):
+        self.service_pricing = service_pricing
+        self.detect_intent = detect_intent
+        self.max_words = max_words
+        self.catalog_options = catalog_options
+        self._service_patterns = [
+            (key, re.compile(r"\b(" + "|".join(re.escape(alias) for alias in aliases) + r")\b"))
+            for key, aliases in SERVICE_ALIASES.items() if key in service_pricing
+        ]
+        self.hits = 0
+        self.misses = 0
+        self.fast_seconds = 0.0
+        self.llm_turns = 0
+        self.llm_seconds = 0.0
+
+    def _find_services(self, folded: str) -> List[str]:
+        return [key for key, pattern in self._service_patterns if pattern.search(folded)]
+
+    def _is_qualified(self, folded: str, service_key: str) -> bool:
+        """Whether the service is narrowed to a part of the car ("polimento do farol")"""
+        pattern = dict(self._service_patterns)[service_key]
+        for match in pattern.finditer(folded):
+            qualifier = _QUALIFIER.match(folded, match.end())
+            if qualifier is None:
+                continue
+            if qualifier.group(2):
+                return True
+            word = qualifier.group(1)
+            if word not in _WHOLE_CAR and get_vehicle_catalog().find_in_text(word) is None:
+                return True
+        return False
+
+    def route(self, message: str) -> Optional[str]:
+        """Reply for a confident price/catalog question, None to use the agent"""
+        started = time.perf_counter()
+        reply = self._route(message)
+        if reply is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.fast_seconds += time.perf_counter() - started
+        return reply
+
+    def _route(self, message: str) -> Optional[str]:
+        folded = fold(message)
+        if len(folded.split()) > self.max_words or _SCHEDULING.search(folded):
+            return None
+
+        intent = self.detect_intent(message)
+        services = self._find_services(folded)
+
+        if intent == "price_inquiry" and len(services) == 1:
+            if self._is_qualified(folded, services[0]):
+                return None
+            return self._price_reply(services[0], get_vehicle_catalog().find_in_text(message))
+
+        if intent in ("price_inquiry", "service_inquiry") and not services and _CATALOG.search(folded):
+            return self._catalog_reply()
+
+        return None
+
+    def _price_reply(self, service_key: str, vehicle: Optional[VehicleMatch]) -> str:
+        service = self.service_pricing[service_key]
+        article = "A" if service_key in FEMININE_SERVICES else "O"
+        if vehicle:
+            # Prompt rules: name only (no description), category in plain words, never "P/G"
+            if vehicle.category == VehicleCategory.GRANDE:
+                price, category = service.price_g, "SUV/picape"
+            else:
+                price, category = service.price_p, "carro pequeno"
+            return (
+                f"{article} {service.name} para {vehicle.model} ({category}) sai por {format_brl(price)}. "
+                "Quer agendar um horário? 🚗"
+            )
+        return (
+            f"{article} {service.name} sai por {format_brl(service.price_p)} para carros pequenos "
+            f"e {format_brl(service.price_g)} para SUVs e picapes. "
+            "Qual o modelo do seu carro? 🚗"
+        )
+
+    def _catalog_reply(self) -> str:
+        # Prompt rules: never the whole list, 2-3 options from the highest price down, names only
+        services = sorted(self.service_pricing.values(), key=lambda service: service.price_p, reverse=True)
+        options = [f"{service.name} (a partir de {format_brl(service.price_p)})" for service in services[:self.catalog_options]]
+        listed = ", ".join(options[:-1]) + " e " + options[-1] if len(options) > 1 else options[0]
+        return f"Temos {listed}. Qual o modelo do seu carro? Assim te passo o valor exato 🚗"
+
+    def record_llm_turn(self, seconds: float):
+        """Record the latency of a turn answered by the agent graph"""
+        self.llm_turns += 1
+        self.llm_seconds += seconds
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get fast path hit rate and latency next to the LLM path"""
+        routed = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / routed * 100, 2) if routed else 0.0,
+            "fast_path_avg_ms": round(self.fast_seconds / self.hits * 1000, 3) if self.hits else 0.0,
+            "llm_turns": self.llm_turns,
+            "llm_avg_ms": round(self.llm_seconds / self.llm_turns * 1000, 1) if self.llm_turns else 0.0
+        }
@@ -0,0 +1,238 @@
+"""
+Token-budgeted conversation history for the Luciano agent
+
+Runs as the agent's ``pre_model_hook``: the most recent turns are sent to the
+model verbatim and everything older is collapsed into a running summary, so the
+prompt stays under a fixed token budget no matter how long the conversation
+gets. The summary is only rebuilt when the window moves.
+"""
+
+import functools
+import logging
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "Resumo da conversa até aqui (mensagens antigas):\n"
+
+SUMMARY_INSTRUCTIONS = (
+    "Resuma a conversa entre o cliente e Luciano em português, em no máximo "
+    "{max_words} palavras. Preserve modelo/ano do veículo, serviços e preços citados, "
+    "data/horário, nome e telefone do cliente e a opção de atendimento escolhida."
+)
+
+# Fixed per-message overhead of the chat format (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+@functools.lru_cache(maxsize=1)
+def _get_encoding(encoding_name: str):
+    """Load the tiktoken encoding once; None when it can't be loaded"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        # tiktoken downloads encodings on first use; offline we estimate instead
+        logger.warning(f"tiktoken encoding {encoding_name} unavailable, estimating tokens: {str(e)}")
+        return None
+
+@functools.lru_cache(maxsize=8192)
+def count_text_tokens(text: str, encoding_name: str = "o200k_base") -> int:
+    """Count tokens of a text (memoized, messages are recounted every turn)"""
+    encoding = _get_encoding(encoding_name)
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def _message_text(message: BaseMessage) -> str:
+    """Flatten a message into the text the model will see"""
+    text = message.content if isinstance(message.content, str) else str(message.content)
+    if isinstance(message, AIMessage) and message.tool_calls:
+        text += str([(call.get("name"), call.get("args")) for call in message.tool_calls])
+    return text
+
+class TruncatingSummarizer:
+    """Offline summarizer that keeps a clipped line per old message"""
+
+    def __init__(self, max_chars_per_message: int = 160):
+        self.max_chars_per_message = max_chars_per_message
+
+    def summarize(self, previous_summary: str, messages: List[BaseMessage], max_words: int) -> str:
+        lines = [previous_summary] if previous_summary else []
+        for message in messages:
+            if isinstance(message, HumanMessage):
+                speaker = "Cliente"
+            elif isinstance(message, AIMessage) and not message.tool_calls:
+                speaker = "Luciano"
+            else:
+                continue
+            lines.append(f"{speaker}: {_message_text(message)[:self.max_chars_per_message]}")
+
+        # Keep the newest lines that fit the word budget
+        words = "\n".join(lines).split(" ")
+        return " ".join(words[-max_words:])
+
+    async def asummarize(self, previous_summary: str, messages: List[BaseMessage], max_words: int) -> str:
+        return self.summarize(previous_summary, messages, max_words)
+
+class ModelSummarizer:
+    """Summarizer backed by a chat model (one call per window move)"""
+
+    def __init__(self, model):
+        # "nostream" keeps summary tokens out of the /chat/stream token events
+        self.model = model.with_config(tags=["nostream"])
+
+    def _build_messages(self, previous_summary: str, messages: List[BaseMessage], max_words: int) -> List[BaseMessage]:
+        transcript = "\n".join(
+            f"{'Cliente' if isinstance(m, HumanMessage) else 'Luciano'}: {_message_text(m)}"
+            for m in messages if not isinstance(m, ToolMessage)
+        )
+        if previous_summary:
+            transcript = f"Resumo anterior:\n{previous_summary}\n\nNovas mensagens:\n{transcript}"
+        return [
+            SystemMessage(content=SUMMARY_INSTRUCTIONS.format(max_words=max_words)),
+            HumanMessage(content=transcript)
+        ]
+
+    def summarize(self, previous_summary: str, messages: List[BaseMessage], max_words: int) -> str:
+        return self.model.invoke(self._build_messages(previous_summary, messages, max_words)).content
+
+    async def asummarize(self, previous_summary: str, messages: List[BaseMessage], max_words: int) -> str:
+        result = await self.model.ainvoke(self._build_messages(previous_summary, messages, max_words))
+        return result.content
+
+class HistoryManager:
+    """Keeps the agent prompt under a token budget with a rolling summary"""
+
+    def __init__(
+        self,
+        max_tokens: int = 4000,
+        system_prompt: str = "",
+        summary_max_tokens: int = 300,
+        summarizer=None,
+        encoding_name: str = "o200k_base"
+    ):
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.summarizer = summarizer or TruncatingSummarizer()
+        self.encoding_name = encoding_name
+        self.system_prompt_tokens = count_text_tokens(system_prompt, encoding_name) if system_prompt else 0
+        # thread_id -> {"cut": index of first verbatim message, "summary": text}
+        self._summaries: Dict[str, Dict[str, Any]] = {}
+        # thread_id -> token counts of the last prompt built for it
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self.summaries_built = 0
+
+    @property
+    def history_budget(self) -> int:
+        """Tokens left for verbatim history after system prompt and summary"""
+        return max(0, self.max_tokens - self.system_prompt_tokens - self.summary_max_tokens)
+
+    @property
+    def _summary_words(self) -> int:
+        # Portuguese averages a bit under one word per 1.5 tokens
+        return max(20, int(self.summary_max_tokens / 1.5))
+
+    def count_message_tokens(self, message: BaseMessage) -> int:
+        """Count tokens of a single message"""
+        return count_text_tokens(_message_text(message), self.encoding_name) + MESSAGE_OVERHEAD_TOKENS
+
+    def _window_start(self, messages: List[BaseMessage], tokens: List[int]) -> int:
+        """Index of the oldest message kept verbatim
+
+        The window always starts at a HumanMessage so tool calls are never
+        separated from their results, and always includes the latest one.
+        """
+        budget = self.history_budget
+        total = 0
+        start = None
+        for index in range(len(messages) - 1, -1, -1):
+            total += tokens[index]
+            if isinstance(messages[index], HumanMessage):
+                if start is not None and total > budget:
+                    break
+                start = index
+        return start or 0
+
+    def _plan(self, state: Dict[str, Any], config: Optional[Dict[str, Any]]):
+        """Work out the window and whether the summary must be rebuilt"""
+        messages = state["messages"]
+        thread_id = ((config or {}).get("configurable") or {}).get("thread_id", "default")
+        tokens = [self.count_message_tokens(message) for message in messages]
+        cut = self._window_start(messages, tokens)
+
+        cached = self._summaries.get(thread_id, {"cut": 0, "summary": ""})
+        if cut < cached["cut"]:
+            # History was replaced (e.g. reused thread id); start over
+            cached = {"cut": 0, "summary": ""}
+        return thread_id, messages, tokens, cut, cached
+
+    def _finish(self, thread_id: str, messages: List[BaseMessage], tokens: List[int], cut: int,
+                summary: str) -> Dict[str, Any]:
+        """Assemble the model input and record token counts"""
+        self._summaries[thread_id] = {"cut": cut, "summary": summary}
+
+        window = messages[cut:]
+        llm_input: List[BaseMessage] = list(window)
+        summary_tokens = 0
+        if summary:
+            summary_message = SystemMessage(content=SUMMARY_PREFIX + summary)
+            summary_tokens = self.count_message_tokens(summary_message)
+            llm_input.insert(0, summary_message)
+
+        full_tokens = self.system_prompt_tokens + sum(tokens)
+        prompt_tokens = self.system_prompt_tokens + summary_tokens + sum(tokens[cut:])
+        self._stats[thread_id] = {
+            "history_messages": len(messages),
+            "summarized_messages": cut,
+            "full_history_tokens": full_tokens,
+            "prompt_tokens": prompt_tokens,
+            "summary_tokens": summary_tokens,
+            "saved_tokens": max(0, full_tokens - prompt_tokens)
+        }
+        return {"llm_input_messages": llm_input}
+
+    def pre_model_hook(self, state: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Build the windowed model input (sync graph execution)"""
+        thread_id, messages, tokens, cut, cached = self._plan(state, config)
+        summary = cached["summary"]
+        if cut > cached["cut"]:
+            summary = self.summarizer.summarize(summary, messages[cached["cut"]:cut], self._summary_words)
+            self.summaries_built += 1
+        return self._finish(thread_id, messages, tokens, cut, summary)
+
+    async def apre_model_hook(self, state: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Build the windowed model input (async graph execution)"""
+        thread_id, messages, tokens, cut, cached = self._plan(state, config)
+        summary = cached["summary"]
+        if cut > cached["cut"]:
+            summary = await self.summarizer.asummarize(summary, messages[cached["cut"]:cut], self._summary_words)
+            self.summaries_built += 1
+        return self._finish(thread_id, messages, tokens, cut, summary)
+
+    def as_hook(self) -> RunnableLambda:
+        """Runnable usable as ``create_react_agent(pre_model_hook=...)``"""
+        return RunnableLambda(self.pre_model_hook, afunc=self.apre_model_hook, name="history_window")
+
+    def get_thread_stats(self, thread_id: str) -> Optional[Dict[str, int]]:
+        """Token counts of the last prompt built for a thread"""
+        return self._stats.get(thread_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Aggregate token statistics across threads"""
+        return {
+            "max_tokens": self.max_tokens,
+            "system_prompt_tokens": self.system_prompt_tokens,
+            "tracked_threads": len(self._stats),
+            "summaries_built": self.summaries_built,
+            "full_history_tokens": sum(s["full_history_tokens"] for s in self._stats.values()),
+            "prompt_tokens": sum(s["prompt_tokens"] for s in self._stats.values()),
+            "saved_tokens": sum(s["saved_tokens"] for s in self._stats.values())
+        }
+
+    def forget(self, thread_id: str):
+        """Drop cached summary and stats for a deleted session"""
+        self._summaries.pop(thread_id, None)
+        self._stats.pop(thread_id, None)
@@ -0,0 +1,127 @@
+"""
+Pooled HTTP clients for outbound integrations (Tavily, Firecrawl)
+
+One keep-alive client per upstream base URL, shared by every call site, so
+repeated tool calls reuse open connections instead of paying a TCP + TLS
+handshake each time. Each upstream gets its own connection limits, which
+makes them per-host limits. The pool is opened in the app lifespan and
+closed at shutdown.
+"""
+
+import contextlib
+import logging
+import threading
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+class HTTPClientPool:
+    """Shared async (and sync) httpx clients keyed by upstream base URL"""
+
+    def __init__(
+        self,
+        max_connections_per_host: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 30.0,
+        connect_timeout: float = 5.0
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections_per_host,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        # Blocking callers (agent tools run in worker threads, scripts)
+        self._sync_clients: Dict[str, httpx.Client] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def _on_request(self, request: httpx.Request):
+        self.requests += 1
+
+    async def _aon_request(self, request: httpx.Request):
+        self.requests += 1
+
+    def client(self, base_url: str) -> httpx.AsyncClient:
+        """Get the shared async client for an upstream ("" for absolute URLs to any host)"""
+        with self._lock:
+            client = self._clients.get(base_url)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(
+                    base_url=base_url,
+                    limits=self.limits,
+                    timeout=self.timeout,
+                    event_hooks={"request": [self._aon_request]}
+                )
+                self._clients[base_url] = client
+            return client
+
+    def sync_client(self, base_url: str) -> httpx.Client:
+        """Get the shared blocking client for an upstream"""
+        with self._lock:
+            client = self._sync_clients.get(base_url)
+            if client is None or client.is_closed:
+                client = httpx.Client(
+                    base_url=base_url,
+                    limits=self.limits,
+                    timeout=self.timeout,
+                    event_hooks={"request": [self._on_request]}
+                )
+                self._sync_clients[base_url] = client
+            return client
+
+    async def aclose(self):
+        """Close every client and its pooled connections"""
+        with self._lock:
+            clients = list(self._clients.values())
+            sync_clients = list(self._sync_clients.values())
+            self._clients.clear()
+            self._sync_clients.clear()
+        for client in clients:
+            await client.aclose()
+        for client in sync_clients:
+            client.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool statistics"""
+        return {
+            "upstreams": sorted(set(self._clients) | set(self._sync_clients)),
+            "max_connections_per_host": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "requests": self.requests
+        }
+
+# Process-wide pool shared by every integration
+_http_pool: Optional[HTTPClientPool] = None
+_http_pool_lock = threading.Lock()
+
+def get_http_pool() -> HTTPClientPool:
+    """Get the shared pool (created with defaults outside the app lifespan)"""
+    global _http_pool
+    if _http_pool is None:
+        with _http_pool_lock:
+            if _http_pool is None:
+                _http_pool = HTTPClientPool()
+    return _http_pool
+
+@contextlib.asynccontextmanager
+async def open_http_pool(**options) -> AsyncIterator[HTTPClientPool]:
+    """Install a configured shared pool for the lifetime of the app"""
+    global _http_pool
+    pool = HTTPClientPool(**options)
+    with _http_pool_lock:
+        previous, _http_pool = _http_pool, pool
+    if previous is not None:
+        await previous.aclose()
+    logger.info(f"Opened HTTP client pool ({pool.limits.max_connections} connections per host)")
+    try:
+        yield pool
+    finally:
+        await pool.aclose()
+        with _http_pool_lock:
+            if _http_pool is pool:
+                _http_pool = None
@@ -0,0 +1,68 @@
+"""
+Keyword intent classifier for customer messages
+
+Each intent has a list of keywords, checked in priority order against the
+lowercased message: the first intent with a keyword anywhere in the message
+wins, like the original ``any(word in message_lower ...)`` checks. Keywords
+are written with their accents and also matched folded ("preço" and
+"preco"), so messages typed without accents are understood without folding
+every message.
+
+Plain substring checks beat both a single compiled alternation and
+per-word memoization here: folding or regex-scanning each message costs
+more than the handful of ``in`` tests (see benchmarks/intent_classifier.py).
+"""
+
+from typing import Dict, Iterable, List, Tuple
+
+from text_folding import fold
+
+DEFAULT_INTENT = "general_inquiry"
+
+# Ordered by priority
+INTENT_KEYWORDS: Dict[str, List[str]] = {
+    "price_inquiry": ["quanto", "preço", "valor", "custa", "sai"],
+    "service_inquiry": ["serviço", "fazem", "faz", "tipo"],
+    "scheduling": ["agendar", "horário", "agenda", "vaga", "marcar"],
+    "contact_info": ["endereço", "localização", "contato", "telefone"]
+}
+
+class IntentClassifier:
+    """Priority-ordered keyword classifier with a batch API"""
+
+    def __init__(self, intent_keywords: Dict[str, List[str]] = INTENT_KEYWORDS, default: str = DEFAULT_INTENT):
+        self.intents = list(intent_keywords)
+        self.default = default
+        # intent -> keywords in both spellings ("preço", "preco")
+        self._keywords: List[Tuple[str, Tuple[str, ...]]] = [
+            (intent, tuple(dict.fromkeys(form for word in words for form in (word.lower(), fold(word)))))
+            for intent, words in intent_keywords.items()
+        ]
+
+    def detect(self, message: str) -> str:
+        """Intent of a single message"""
+        lowered = message.lower()
+        for intent, words in self._keywords:
+            for word in words:
+                if word in lowered:
+                    return intent
+        return self.default
+
+    def detect_many(self, messages: Iterable[str]) -> List[str]:
+        """Intents of many messages, classifying each distinct message once"""
+        messages = list(messages)
+        unique = dict.fromkeys(messages)
+        for message in unique:
+            unique[message] = self.detect(message)
+        return list(map(unique.__getitem__, messages))
+
+# Shared default classifier
+intent_classifier = IntentClassifier()
+
+def detect_intent(message: str) -> str:
+    """Intent of a single message"""
+    return intent_classifier.detect(message)
+
+def detect_intents(messages: Iterable[str]) -> List[str]:
+    """Intents of many messages (batch API)"""
+    return intent_classifier.detect_many(messages)
@@ -2,9 +2,9 @@ from langgraph.prebuilt import create_react_agent # Função principal do LangGr
 from langchain_core.messages import SystemMessage # Para definir a mensagem de sistema (persona)
 from langchain_core.tools import tool # Decorador para definir ferramentas
 from langchain_openai import ChatOpenAI # Modelo LLM da OpenAI (GPT)
-from langchain_community.tools.tavily_search import TavilySearchResults # Ferramenta de busca Tavily
 import os
 from dotenv import load_dotenv # Para carregar variáveis de ambiente
+from search_cache import cached_tavily_search # Cache compartilhado de resultados da Tavily
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -132,8 +132,7 @@ Você tem acesso a ferramentas para buscar informações e deve usá-las para co
 @tool
 def search_web(query: str = "") -> str:
     """Busca informações na web sobre estética automotiva, Vanlu, serviços ou preços quando necessário."""
-    tavily_search = TavilySearchResults(max_results=3, api_key=TAVILY_API_KEY)
-    search_docs = tavily_search.invoke(query)
+    search_docs = cached_tavily_search(query, max_results=3, api_key=TAVILY_API_KEY) # Consultas repetidas saem do cache
     return search_docs
 
 # Criação do Agente ReAct
@@ -6,21 +6,32 @@ Integrates LangGraph Agent with MCP Firecrawl capabilities
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from sse_starlette.sse import EventSourceResponse
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
 import asyncio
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime
 
 # Import existing LangGraph components
 from langgraph.prebuilt import create_react_agent
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from langchain_core.messages import SystemMessage
 from langchain_core.tools import tool
 from langchain_openai import ChatOpenAI
-from langchain_community.tools.tavily_search import TavilySearchResults
 import os
 from dotenv import load_dotenv
 
+from models import APIConfiguration, vehicle_category, ScrapeRequest as FirecrawlScrapeRequest
+from services import initialize_services, get_services
+from checkpoints import open_checkpointer
+from history import HistoryManager, ModelSummarizer
+from search_cache import acached_tavily_search, get_search_cache
+from http_clients import open_http_pool, get_http_pool
+from embedding_cache import get_embedding_cache
+from service_index import ServiceIndex, format_service_results, get_embedding_provider
+from api_endpoints import api_router, sse_events
+
 # Load environment variables
 load_dotenv()
 
@@ -28,11 +39,29 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open long-lived resources for the lifetime of the app"""
+    async with open_http_pool(
+        max_connections_per_host=api_config.http_max_connections_per_host,
+        max_keepalive_connections=api_config.http_max_keepalive_connections,
+        timeout=api_config.http_timeout,
+        connect_timeout=api_config.http_connect_timeout
+    ), open_checkpointer(api_config.checkpointer, api_config.checkpoint_db_path) as checkpointer:
+        if checkpointer is not None:
+            luciano_service.set_graph(build_graph(checkpointer))
+        get_services()["competitor"].snapshots.start()
+        yield
+        await get_services()["competitor"].snapshots.stop()
+        await luciano_service.shutdown()
+        await get_services()["scraping"].shutdown()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Vanlu API",
     description="API for Vanlu Estética Automotiva with LangGraph Agent and Web Scraping",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -172,19 +201,82 @@ Você tem acesso a ferramentas para buscar informações e deve usá-las para co
 
 # Define tools for the agent
 @tool
-def search_web(query: str = "") -> str:
+async def search_web(query: str = "") -> str:
     """Busca informações na web sobre estética automotiva, Vanlu, serviços ou preços quando necessário."""
-    tavily_search = TavilySearchResults(max_results=3, api_key=TAVILY_API_KEY)
-    search_docs = tavily_search.invoke(query)
+    search_docs = await acached_tavily_search(query, max_results=3, api_key=TAVILY_API_KEY)
     return search_docs
 
+@tool
+def search_services(need: str, vehicle_model: str = "") -> str:
+    """Busca os serviços da Vanlu mais adequados à necessidade do cliente (ex.: "tirar arranhões", "limpar bancos"), com preços para o modelo do veículo se informado."""
+    category = vehicle_category(vehicle_model) if vehicle_model else None
+    return format_service_results(service_index.search(need, k=3), category)
+
+api_config = APIConfiguration(
+    max_concurrent_agent_runs=int(os.getenv("AGENT_MAX_CONCURRENCY", "8")),
+    checkpointer=os.getenv("CHECKPOINTER", "memory"),
+    checkpoint_db_path=os.getenv("CHECKPOINT_DB_PATH", "data/checkpoints.sqlite"),
+    history_max_tokens=int(os.getenv("HISTORY_MAX_TOKENS", "6000")),
+    max_sessions=int(os.getenv("MAX_SESSIONS", "1000")),
+    session_timeout=int(os.getenv("SESSION_TIMEOUT", "3600")),
+    session_shards=int(os.getenv("SESSION_SHARDS", "16")),
+    session_backend=os.getenv("SESSION_BACKEND", "memory"),
+    session_db_path=os.getenv("SESSION_DB_PATH", "data/sessions.sqlite"),
+    http_max_connections_per_host=int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20")),
+    http_timeout=float(os.getenv("HTTP_TIMEOUT", "30")),
+    enable_fast_path=os.getenv("FAST_PATH", "true").lower() == "true",
+    enable_response_templates=os.getenv("RESPONSE_TEMPLATES", "true").lower() == "true",
+    embeddings_provider=os.getenv("EMBEDDINGS_PROVIDER", "hashing"),
+    embeddings_cache_dir=os.getenv("EMBEDDINGS_CACHE_DIR", "data/embeddings"),
+    scrape_max_concurrency_per_host=int(os.getenv("SCRAPE_MAX_CONCURRENCY_PER_HOST", "4")),
+    scrape_timeout=float(os.getenv("SCRAPE_TIMEOUT", "60")),
+    scrape_max_retries=int(os.getenv("SCRAPE_MAX_RETRIES", "3")),
+    crawl_workers_per_job=int(os.getenv("CRAWL_WORKERS_PER_JOB", "4")),
+    crawl_max_running_jobs=int(os.getenv("CRAWL_MAX_RUNNING_JOBS", "2")),
+    scrape_cache_max_entries=int(os.getenv("SCRAPE_CACHE_MAX_ENTRIES", "500")),
+    scrape_cache_max_age=int(os.getenv("SCRAPE_CACHE_MAX_AGE", "86400")),
+    competitor_max_concurrency=int(os.getenv("COMPETITOR_MAX_CONCURRENCY", "20")),
+    competitor_snapshot_max_age=int(os.getenv("COMPETITOR_SNAPSHOT_MAX_AGE", "86400")),
+    competitor_refresh_interval=int(os.getenv("COMPETITOR_REFRESH_INTERVAL", "86400")),
+    competitor_locations=[location.strip() for location in os.getenv("COMPETITOR_LOCATIONS", "Aracaju").split(",") if location.strip()],
+    competitor_snapshot_path=os.getenv("COMPETITOR_SNAPSHOT_PATH") or None,
+    competitor_scheduler_enabled=os.getenv("COMPETITOR_SCHEDULER_ENABLED", "false").lower() == "true"
+)
+
+# Keeps the prompt under the token budget with a rolling summary of old turns
+history_manager = HistoryManager(
+    max_tokens=api_config.history_max_tokens,
+    system_prompt=system_message.content,
+    summary_max_tokens=api_config.history_summary_max_tokens,
+    summarizer=ModelSummarizer(model)
+) if api_config.history_max_tokens > 0 else None
+
 # Create LangGraph agent
-tools = [search_web]
-graph = create_react_agent(
-    model,
-    tools=tools,
-    prompt=system_message
+tools = [search_web, search_services]
+
+def build_graph(checkpointer=None):
+    """Build the Luciano ReAct agent, optionally with a checkpointer"""
+    return create_react_agent(
+        model,
+        tools=tools,
+        prompt=system_message,
+        checkpointer=checkpointer,
+        pre_model_hook=history_manager.as_hook() if history_manager else None
+    )
+
+graph = build_graph()
+
+# Initialize service layer (shares the agent runner between /chat and /api/v1)
+initialize_services(graph, tools, api_config, history_manager=history_manager)
+luciano_service = get_services()["luciano"]
+
+# Semantic service lookup for the search_services tool (embeddings memory-mapped from disk)
+service_index = ServiceIndex.from_pricing(
+    luciano_service.service_pricing,
+    get_embedding_provider(api_config.embeddings_provider),
+    cache_dir=api_config.embeddings_cache_dir
 )
+app.include_router(api_router)
 
 # Pydantic models for API
 class ChatMessage(BaseModel):
@@ -205,8 +297,8 @@ class SearchResult(BaseModel):
     results: List[Dict[str, Any]] = Field(..., description="Resultados da busca")
     timestamp: datetime = Field(default_factory=datetime.now)
 
-# Store for active sessions
-active_sessions: Dict[str, Dict] = {}
+# Store for active sessions (owned by the agent service, bounded LRU + TTL)
+active_sessions = luciano_service.sessions
 
 # API Routes
 @app.get("/")
@@ -217,6 +309,7 @@ async def root():
         "version": "1.0.0",
         "endpoints": [
             "/chat",
+            "/chat/stream",
             "/scrape",
             "/search",
             "/health",
@@ -241,61 +334,43 @@ async def health_check():
 async def chat_with_agent(message: ChatMessage):
     """Chat com o agente Luciano"""
     try:
-        # Generate or use existing session ID
-        session_id = message.session_id or f"session_{datetime.now().timestamp()}"
-
-        # Get or create session state
-        if session_id not in active_sessions:
-            active_sessions[session_id] = {
-                "messages": [],
-                "created_at": datetime.now()
-            }
-
-        # Add human message to session
-        session = active_sessions[session_id]
-        session["messages"].append(HumanMessage(content=message.message))
-
-        # Get response from LangGraph agent
-        config = {"configurable": {"thread_id": session_id}}
-        result = graph.invoke(
-            {"messages": session["messages"]},
-            config=config
-        )
-
-        # Extract response
-        agent_response = result["messages"][-1].content
-
-        # Add AI response to session
-        session["messages"].append(AIMessage(content=agent_response))
+        # Agent turn runs on the event loop without blocking other requests
+        result = await luciano_service.chat(message.message, message.session_id)
 
         return ChatResponse(
-            response=agent_response,
-            session_id=session_id
+            response=result.response,
+            session_id=result.session_id
         )
 
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/stream")
+async def chat_with_agent_stream(message: ChatMessage):
+    """Chat com o agente Luciano com resposta em streaming (SSE)"""
+    return EventSourceResponse(sse_events(luciano_service.chat_stream(message.message, message.session_id)))
+
 @app.post("/scrape")
 async def scrape_website(request: ScrapeRequest):
-    """Web scraping usando MCP Firecrawl (quando disponível)"""
+    """Web scraping usando Firecrawl"""
     try:
-        # Placeholder for MCP Firecrawl integration
-        # Will be implemented when MCP Firecrawl is available
-
         if not FIRECRAWL_API_KEY:
             return {
                 "error": "FIRECRAWL_API_KEY not configured",
                 "message": "Configure FIRECRAWL_API_KEY in environment variables"
             }
 
-        # TODO: Implement MCP Firecrawl integration
+        result = await get_services()["scraping"].scrape_url(
+            FirecrawlScrapeRequest(url=request.url, formats=[request.format])
+        )
         return {
-            "message": "MCP Firecrawl integration coming soon",
-            "url": request.url,
+            "message": result.message,
+            "url": result.url,
             "format": request.format,
-            "status": "pending"
+            "status": "completed" if result.success else "failed",
+            "content": result.content.get(request.format),
+            "metadata": result.metadata
         }
 
     except Exception as e:
@@ -309,9 +384,8 @@ async def search_competitors(query: str = ""):
         if not query:
             raise HTTPException(status_code=400, detail="Query parameter is required")
 
-        # Use Tavily search for competitor analysis
-        search_tool = TavilySearchResults(max_results=5, api_key=TAVILY_API_KEY)
-        results = search_tool.invoke(query)
+        # Use Tavily search for competitor analysis (shared result cache)
+        results = await acached_tavily_search(query, max_results=5, api_key=TAVILY_API_KEY)
 
         return SearchResult(
             query=query,
@@ -325,32 +399,45 @@ async def search_competitors(query: str = ""):
 @app.get("/sessions")
 async def list_sessions():
     """List all active sessions"""
+    sessions = await active_sessions.aitems()
     return {
-        "active_sessions": len(active_sessions),
+        "active_sessions": len(sessions),
         "sessions": {
             session_id: {
                 "created_at": session["created_at"],
-                "message_count": len(session["messages"])
+                "message_count": session["message_count"],
+                "tokens": luciano_service.get_session_tokens(session_id)
             }
-            for session_id, session in active_sessions.items()
+            for session_id, session in sessions
         }
     }
 
 @app.delete("/sessions/{session_id}")
 async def delete_session(session_id: str):
     """Delete a specific session"""
-    if session_id in active_sessions:
-        del active_sessions[session_id]
+    if await luciano_service.delete_session(session_id):
         return {"message": f"Session {session_id} deleted"}
     raise HTTPException(status_code=404, detail="Session not found")
 
 @app.get("/stats")
 async def get_stats():
     """Get API statistics"""
+    sessions = await active_sessions.aitems()
     return {
-        "total_sessions": len(active_sessions),
-        "total_messages": sum(len(session["messages"]) for session in active_sessions.values()),
+        "total_sessions": len(sessions),
+        "total_messages": sum(session["message_count"] for _, session in sessions),
         "uptime": "N/A",  # TODO: Implement uptime tracking
+        "agent": luciano_service.runner.get_stats(),
+        "fast_path": luciano_service.fast_path.get_stats() if luciano_service.fast_path else None,
+        "templates": luciano_service.templates.get_stats() if luciano_service.templates else None,
+        "history": history_manager.get_stats() if history_manager else None,
+        "session_store": await active_sessions.aget_stats(),
+        "search_cache": get_search_cache().get_stats(),
+        "scraping": get_services()["scraping"].get_stats(),
+        "competitors": get_services()["competitor"].get_stats(),
+        "http_pool": get_http_pool().get_stats(),
+        "service_index": service_index.get_stats(),
+        "embedding_cache": get_embedding_cache().get_stats(),
         "version": "1.0.0"
     }
 
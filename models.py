@@ -7,6 +7,8 @@ from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime
 from enum import Enum
 
+from vehicle_catalog import get_vehicle_catalog
+
 # Enums
 class VehicleCategory(str, Enum):
     PEQUENO = "P"  # Hatch, Sedã, Coupé, Compactos
@@ -67,6 +69,10 @@ class SessionList(BaseResponse):
     total_sessions: int
     sessions: List[SessionInfo]
 
+def vehicle_category(model: str) -> VehicleCategory:
+    """Price category of a vehicle model (Categoria G: SUV, Caminhonete, Pickup, Utilitários)"""
+    return VehicleCategory(get_vehicle_catalog().category(model))
+
 # Appointment Models
 class VehicleInfo(BaseModel):
     model: str = Field(..., min_length=2, description="Modelo do veículo")
@@ -76,16 +82,7 @@ class VehicleInfo(BaseModel):
     @validator('category', always=True)
     def calculate_category(cls, v, values):
         if 'model' in values:
-            model = values['model'].lower()
-            # Categoria G: SUV, Caminhonete, Pickup, Utilitários
-            suv_keywords = ['suv', 'hr-v', 'compass', 't-cross', 'tracker', 'creta', 'duster', 'renegade', 'tucson']
-            pickup_keywords = ['hilux', 'ranger', 's10', 'saveiro', 'strada', 'toro']
-            truck_keywords = ['amarok', 'l200', 'fiorino', 'ducato']
-
-            if (any(keyword in model for keyword in suv_keywords) or
-                any(keyword in model for keyword in pickup_keywords) or
-                any(keyword in model for keyword in truck_keywords)):
-                return VehicleCategory.GRANDE
+            return vehicle_category(values['model'])
 
         return VehicleCategory.PEQUENO
 
@@ -135,6 +132,22 @@ class AppointmentResponse(BaseResponse):
     vehicle: VehicleInfo
     total_price: float
 
+class VehicleClassifyRequest(BaseModel):
+    models: List[str] = Field(..., min_length=1, max_length=1000, description="Modelos de veículos (ex: frota)")
+
+class VehicleClassification(BaseModel):
+    input: str
+    brand: Optional[str] = None
+    model: Optional[str] = None
+    category: VehicleCategory
+    match: Literal["exact", "fuzzy", "none"]
+    score: float = 0.0
+
+class VehicleClassifyResponse(BaseResponse):
+    total: int
+    categories: Dict[str, int]
+    vehicles: List[VehicleClassification]
+
 # Service Models
 class ServiceInfo(BaseModel):
     name: str
@@ -156,6 +169,7 @@ class ScrapeRequest(BaseModel):
     only_main_content: bool = Field(default=True, description="Extrair apenas conteúdo principal")
     wait_for: Optional[int] = Field(None, description="Tempo de espera em ms")
     actions: Optional[List[Dict[str, Any]]] = Field(None, description="Ações a executar antes do scraping")
+    max_age: Optional[int] = Field(None, ge=0, description="Idade máxima do resultado em cache, em segundos (0 ignora o cache)")
 
     @validator('url')
     def validate_url(cls, v):
@@ -178,7 +192,9 @@ class CrawlRequest(BaseModel):
 
 class CrawlResponse(BaseResponse):
     crawl_id: str
-    status: Literal["started", "completed", "failed"]
+    status: Literal["started", "running", "completed", "failed"]
+    pages_scraped: int = 0
+    pages_failed: int = 0
     results: Optional[List[ScrapeResponse]] = None
 
 # Search Models
@@ -192,6 +208,7 @@ class SearchResponse(BaseResponse):
     query: str
     results: List[Dict[str, Any]]
     total_found: int
+    snapshot_age_seconds: Optional[float] = None
 
 # Analytics Models
 class ConversationAnalytics(BaseResponse):
@@ -211,6 +228,17 @@ class CompetitorAnalysis(BaseResponse):
     strengths: List[str]
     weaknesses: List[str]
 
+class CompetitorBatchRequest(BaseModel):
+    urls: List[str] = Field(default_factory=list, max_length=50, description="Sites dos concorrentes")
+    competitors: List[Dict[str, Any]] = Field(
+        default_factory=list, max_length=50, description="Resultados de /scraping/search (usa o campo url)"
+    )
+
+    def target_urls(self) -> List[str]:
+        """URLs to analyze, without duplicates"""
+        urls = self.urls + [competitor["url"] for competitor in self.competitors if competitor.get("url")]
+        return list(dict.fromkeys(urls))
+
 # Health Check Models
 class HealthStatus(BaseModel):
     status: Literal["healthy", "degraded", "unhealthy"]
@@ -224,6 +252,36 @@ class APIConfiguration(BaseModel):
     openai_model: str = "gpt-4.1-mini"
     max_sessions: int = 1000
     session_timeout: int = 3600  # seconds
+    session_shards: int = 16
+    session_backend: Literal["memory", "sqlite"] = "memory"
+    session_db_path: str = "data/sessions.sqlite"
     max_message_length: int = 1000
+    max_concurrent_agent_runs: int = 8
+    checkpointer: Literal["none", "memory", "sqlite"] = "memory"
+    checkpoint_db_path: str = "data/checkpoints.sqlite"
+    history_max_tokens: int = 6000  # 0 disables history windowing
+    history_summary_max_tokens: int = 300
+    http_max_connections_per_host: int = 20
+    http_max_keepalive_connections: int = 10
+    http_timeout: float = 30.0  # seconds
+    http_connect_timeout: float = 5.0
+    enable_fast_path: bool = True  # answer plain price/catalog questions without the LLM
+    enable_response_templates: bool = True  # serve the scripted greeting without the LLM
+    embeddings_provider: Literal["hashing", "openai"] = "hashing"
+    embeddings_cache_dir: str = "data/embeddings"
+    firecrawl_base_url: Optional[str] = None  # defaults to FIRECRAWL_API_URL or the Firecrawl cloud API
+    scrape_max_concurrency_per_host: int = 4
+    scrape_timeout: float = 60.0  # seconds
+    scrape_max_retries: int = 3
+    crawl_workers_per_job: int = 4
+    crawl_max_running_jobs: int = 2
+    scrape_cache_max_entries: int = 500
+    scrape_cache_max_age: int = 86400  # seconds; revalidated with the page after that
+    competitor_max_concurrency: int = 20
+    competitor_snapshot_max_age: int = 86400  # seconds before a snapshot is refreshed in the background
+    competitor_refresh_interval: int = 86400  # seconds between scheduled refreshes; 0 disables them
+    competitor_locations: List[str] = ["Aracaju"]
+    competitor_snapshot_path: Optional[str] = None
+    competitor_scheduler_enabled: bool = False  # needs competitor_snapshot_path; one worker per path runs it
     enable_analytics: bool = True
     enable_scraping: bool = True
\ No newline at end of file
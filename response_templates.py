@@ -0,0 +1,85 @@
+"""
+Precomputed replies for the fixed steps of Luciano's script
+
+The system prompt dictates the exact first reply of every conversation and
+the reply when the customer picks the scheduling system. Those are served
+from the text below instead of an LLM call with the whole prompt; the
+session ``stage`` tracks where the customer is in the script.
+
+The choice is only looked for on the turn right after the greeting, and
+only an explicit one ("pelo sistema", "prefiro o site") counts; questions
+and negated messages are left to the agent.
+"""
+
+import re
+import time
+from typing import Any, Dict, Optional
+
+from text_folding import fold
+
+GREETING = (
+    "Olá! Que bom ter você aqui! 🚗 Você gostaria de realizar seu atendimento por aqui ou "
+    "diretamente pelo nosso sistema? Em menos de um minuto você já consegue fazer seu "
+    "agendamento: https://www.vanluagendamento.online/"
+)
+
+SYSTEM_CHOSEN = "Perfeito! É super rápido por lá. Qualquer dúvida, estou aqui! 👍"
+
+# A bare "sistema" answer, or a choice phrase around sistema/site/link
+_CHOSE_SYSTEM = re.compile(
+    r"^\W*(?:o\s+|pelo\s+)?sistema\W*$"
+    r"|\b(?:pelo|no|via|prefiro\s+o|prefiro|quero\s+o|escolho\s+o)\s+(?:proprio\s+)?(?:sistema|site|link)\b"
+)
+_CHOSE_WHATSAPP = re.compile(r"\b(aqui|whatsapp|zap|com voce)\b")
+_NEGATION = re.compile(r"\b(nao|nem|nunca|sem)\b")
+_QUESTION = re.compile(r"\?|^\W*(qual|quais|quanto|quando|como|onde|porque|por que|tem|voces tem)\b")
+
+class ResponseTemplates:
+    """Serves the scripted greeting and system-choice replies"""
+
+    def __init__(self, max_choice_words: int = 8):
+        self.max_choice_words = max_choice_words
+        self.hits: Dict[str, int] = {"greeting": 0, "system_chosen": 0}
+        self.seconds = 0.0
+
+    def reply(self, session: Dict[str, Any], message: str) -> Optional[str]:
+        """Scripted reply for this turn (advancing ``session["stage"]``), or None"""
+        started = time.perf_counter()
+        name, text = self._match(session, message)
+        if text is not None:
+            self.hits[name] += 1
+            self.seconds += time.perf_counter() - started
+        return text
+
+    def _match(self, session: Dict[str, Any], message: str):
+        stage = session.get("stage", "initial")
+
+        if stage == "initial" and session.get("message_count", 0) == 0:
+            session["stage"] = "system_choice"
+            return "greeting", GREETING
+
+        if stage == "system_choice":
+            # Only the answer to the greeting can pick the channel; whatever it says, move on
+            session["stage"] = "attendance"
+            folded = fold(message)
+            if (len(folded.split()) > self.max_choice_words or _NEGATION.search(folded)
+                    or _QUESTION.search(folded)):
+                return None, None
+            system, whatsapp = _CHOSE_SYSTEM.search(folded), _CHOSE_WHATSAPP.search(folded)
+            if system and not whatsapp:
+                session["stage"] = "completed"
+                return "system_chosen", SYSTEM_CHOSEN
+            if whatsapp and not system:
+                # The consultative attendance itself is up to the agent
+                session["stage"] = "whatsapp_attendance"
+
+        return None, None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get template hits and latency"""
+        served = sum(self.hits.values())
+        return {
+            "hits": dict(self.hits),
+            "served": served,
+            "avg_ms": round(self.seconds / served * 1000, 3) if served else 0.0
+        }
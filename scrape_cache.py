@@ -0,0 +1,140 @@
+"""
+Scrape result cache with conditional revalidation
+
+Scrapes are cached per URL + scrape options, zstd-compressed. Within its
+max-age an entry is served as is. After that it is revalidated with a plain
+conditional GET of the page (``If-None-Match`` / ``If-Modified-Since``); a
+304, or a body with the same content hash as before, keeps the cached scrape
+and only a changed page is sent through Firecrawl again.
+
+Firecrawl doesn't pass the page's own validators through, so they are
+recorded by a direct GET that runs alongside the first scrape (crawl pages
+skip it). The content hash is of the raw page body: it matches for static
+pages, but dynamic ones (timestamps, tokens, rotating banners) differ on
+every fetch, so for sites without ETag/Last-Modified a stale entry usually
+costs the probe's download plus a re-scrape.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import orjson
+import xxhash
+import zstandard
+
+from models import ScrapeRequest, ScrapeResponse
+
+@dataclass(frozen=True)
+class PageValidators:
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+@dataclass
+class ScrapeCacheEntry:
+    url: str
+    blob: bytes
+    raw_size: int
+    validators: Optional[PageValidators]
+    fetched_at: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+class ScrapeCache:
+    """LRU of compressed scrape results with page validators"""
+
+    def __init__(self, max_entries: int = 500, default_max_age: int = 86400, compression_level: int = 3):
+        self.max_entries = max_entries
+        self.default_max_age = default_max_age
+        self._entries: "OrderedDict[str, ScrapeCacheEntry]" = OrderedDict()
+        self._compressor = zstandard.ZstdCompressor(level=compression_level)
+        self._decompressor = zstandard.ZstdDecompressor()
+        self.hits = 0
+        self.revalidated = 0
+        self.changed = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, request: ScrapeRequest) -> str:
+        """Cache key of a scrape: URL plus every option that changes the output"""
+        options = request.model_dump(exclude={"max_age"})
+        return xxhash.xxh64_hexdigest(orjson.dumps(options, option=orjson.OPT_SORT_KEYS))
+
+    def max_age(self, request: ScrapeRequest) -> int:
+        """Max-age of a request, in seconds (0 bypasses the cache)"""
+        return self.default_max_age if request.max_age is None else request.max_age
+
+    def get(self, key: str) -> Optional[ScrapeCacheEntry]:
+        """Cached entry, fresh or not"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def response(self, entry: ScrapeCacheEntry) -> ScrapeResponse:
+        """Decompress an entry back into a scrape response"""
+        data = orjson.loads(self._decompressor.decompress(entry.blob))
+        return ScrapeResponse(
+            success=True,
+            message="URL scraped successfully (cached)",
+            url=entry.url,
+            content=data["content"],
+            metadata=data["metadata"]
+        )
+
+    def put(self, key: str, response: ScrapeResponse, validators: Optional[PageValidators]):
+        """Store a successful scrape"""
+        raw = orjson.dumps({"content": response.content, "metadata": response.metadata})
+        self._entries[key] = ScrapeCacheEntry(
+            url=response.url,
+            blob=self._compressor.compress(raw),
+            raw_size=len(raw),
+            validators=validators,
+            fetched_at=time.time()
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def touch(self, entry: ScrapeCacheEntry, validators: Optional[PageValidators] = None):
+        """Mark an entry as just revalidated"""
+        entry.fetched_at = time.time()
+        if validators is not None:
+            entry.validators = validators
+
+    def clear(self):
+        """Drop every cached scrape"""
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/revalidation counters and storage size"""
+        compressed = sum(len(entry.blob) for entry in self._entries.values())
+        raw = sum(entry.raw_size for entry in self._entries.values())
+        lookups = self.hits + self.revalidated + self.changed + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "default_max_age": self.default_max_age,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "changed": self.changed,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.revalidated) / lookups * 100, 2) if lookups else 0.0,
+            "compressed_bytes": compressed,
+            "raw_bytes": raw,
+            "compression_ratio": round(raw / compressed, 2) if compressed else 0.0
+        }
@@ -0,0 +1,284 @@
+"""
+Shared TTL cache for Tavily search results
+
+The agent's ``search_web`` tool, the ``/search`` endpoint and competitor
+search all go through ``acached_tavily_search`` (``cached_tavily_search`` for
+blocking callers) over the pooled HTTP clients, so repeated queries
+("estética automotiva Aracaju", price lookups) are served from memory, or
+from the optional SQLite layer that survives restarts, instead of the network.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import orjson
+import xxhash
+
+from coalescing import AsyncSingleFlight, SingleFlight
+from http_clients import get_http_pool
+from text_folding import fold
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = re.compile(r"^[\W_]+|[\W_]+$")
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different spellings share a cache entry"""
+    folded = _WHITESPACE.sub(" ", fold(query)).strip()
+    return _EDGE_PUNCTUATION.sub("", folded)
+
+class SearchCache:
+    """LRU + TTL cache of search results with an optional on-disk layer"""
+
+    def __init__(self, ttl_seconds: int = 3600, max_entries: int = 1024, disk_path: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        # key -> (expires_at, results)
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Disk queries hold their own lock so memory lookups never wait on I/O
+        self._disk_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._conn = None
+        # Concurrent misses for the same key share one upstream call
+        self._flight = SingleFlight()
+        self._async_flight = AsyncSingleFlight()
+
+        if disk_path:
+            disk_dir = os.path.dirname(disk_path)
+            if disk_dir:
+                os.makedirs(disk_dir, exist_ok=True)
+            self._conn = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, results BLOB NOT NULL)"
+            )
+
+    def make_key(self, query: str, namespace: str = "") -> str:
+        """Cache key for a query within a namespace (e.g. provider + max_results)"""
+        return xxhash.xxh64_hexdigest(f"{namespace}\x00{normalize_query(query)}".encode("utf-8"))
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get cached results, or None on a miss"""
+        results = self._get_memory(key)
+        if results is None:
+            results = self._get_disk(key)
+        return results
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """Async ``get`` that reads the disk layer in a worker thread"""
+        results = self._get_memory(key)
+        if results is None:
+            results = await asyncio.to_thread(self._get_disk, key)
+        return results
+
+    def _get_memory(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            if self._conn is None:
+                self.misses += 1
+            return None
+
+    def _get_disk(self, key: str) -> Optional[Any]:
+        if self._conn is None:
+            return None
+        with self._disk_lock:
+            row = self._conn.execute(
+                "SELECT expires_at, results FROM search_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            results = orjson.loads(row[1])
+            self._store_locked(key, row[0], results)
+            self.disk_hits += 1
+            return results
+
+    def _store_locked(self, key: str, expires_at: float, results: Any):
+        self._entries[key] = (expires_at, results)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def set(self, key: str, results: Any, ttl_seconds: Optional[int] = None):
+        """Cache results for ``ttl_seconds`` (defaults to the cache TTL)"""
+        expires_at = self._set_memory(key, results, ttl_seconds)
+        self._set_disk(key, expires_at, results)
+
+    async def aset(self, key: str, results: Any, ttl_seconds: Optional[int] = None):
+        """Async ``set`` that writes the disk layer in a worker thread"""
+        expires_at = self._set_memory(key, results, ttl_seconds)
+        if self._conn is not None:
+            await asyncio.to_thread(self._set_disk, key, expires_at, results)
+
+    def _set_memory(self, key: str, results: Any, ttl_seconds: Optional[int]) -> float:
+        expires_at = time.time() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            self._store_locked(key, expires_at, results)
+        return expires_at
+
+    def _set_disk(self, key: str, expires_at: float, results: Any):
+        if self._conn is None:
+            return
+        with self._disk_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, expires_at, results) VALUES (?, ?, ?)",
+                (key, expires_at, orjson.dumps(results, default=str))
+            )
+
+    def get_or_fetch(self, query: str, namespace: str, fetch: Callable[[], Any]) -> Any:
+        """Return cached results or call ``fetch`` and cache what it returns
+
+        Concurrent misses for the same query are coalesced into a single
+        ``fetch``. Only list results are cached; Tavily reports errors as
+        strings.
+        """
+        key = self.make_key(query, namespace)
+        results = self.get(key)
+        if results is not None:
+            return results
+
+        def fetch_and_store():
+            results = fetch()
+            if isinstance(results, list):
+                self.set(key, results)
+            return results
+
+        return self._flight.do(key, fetch_and_store)
+
+    async def aget_or_fetch(self, query: str, namespace: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Async ``get_or_fetch`` for callers running on the event loop
+
+        Memory hits are answered inline; the SQLite layer runs in a worker
+        thread so disk reads and writes never block the loop.
+        """
+        key = self.make_key(query, namespace)
+        results = await self.aget(key)
+        if results is not None:
+            return results
+
+        async def fetch_and_store():
+            results = await fetch()
+            if isinstance(results, list):
+                await self.aset(key, results)
+            return results
+
+        return await self._async_flight.do(key, fetch_and_store)
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._entries.clear()
+        if self._conn is not None:
+            with self._disk_lock:
+                self._conn.execute("DELETE FROM search_cache")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss statistics"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_enabled": self._conn is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups * 100, 2) if lookups else 0.0,
+            "coalescing": self._flight.get_stats(),
+            "async_coalescing": self._async_flight.get_stats()
+        }
+
+# Process-wide cache shared by every Tavily call site
+_search_cache: Optional[SearchCache] = None
+_search_cache_lock = threading.Lock()
+
+def get_search_cache() -> SearchCache:
+    """Get the shared search cache, configured from the environment"""
+    global _search_cache
+    if _search_cache is None:
+        with _search_cache_lock:
+            if _search_cache is None:
+                _search_cache = SearchCache(
+                    ttl_seconds=int(os.getenv("SEARCH_CACHE_TTL", "3600")),
+                    max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024")),
+                    disk_path=os.getenv("SEARCH_CACHE_PATH") or None
+                )
+    return _search_cache
+
+TAVILY_API_URL = os.getenv("TAVILY_API_URL") or "https://api.tavily.com"
+
+def _tavily_payload(query: str, max_results: int, api_key: Optional[str]) -> Dict[str, Any]:
+    # Same request TavilySearchResults sends
+    return {
+        "api_key": api_key,
+        "query": query,
+        "max_results": max_results,
+        "search_depth": "advanced",
+        "include_answer": False,
+        "include_raw_content": False,
+        "include_images": False
+    }
+
+def _clean_tavily_results(response: httpx.Response) -> List[Dict[str, Any]]:
+    response.raise_for_status()
+    return [
+        {
+            "title": result.get("title"),
+            "url": result.get("url"),
+            "content": result.get("content"),
+            "score": result.get("score")
+        }
+        for result in response.json().get("results", [])
+    ]
+
+def cached_tavily_search(query: str, max_results: int, api_key: Optional[str]) -> Any:
+    """Tavily search through the shared cache and pooled HTTP client
+
+    Like ``TavilySearchResults``, errors are returned as a string (and not
+    cached) so the agent can carry on without the search.
+    """
+    def fetch():
+        try:
+            client = get_http_pool().sync_client(TAVILY_API_URL)
+            return _clean_tavily_results(client.post("/search", json=_tavily_payload(query, max_results, api_key)))
+        except Exception as e:
+            logger.warning(f"Tavily search failed: {str(e)}")
+            return repr(e)
+
+    return get_search_cache().get_or_fetch(query, f"tavily:{max_results}", fetch)
+
+async def acached_tavily_search(query: str, max_results: int, api_key: Optional[str]) -> Any:
+    """Async ``cached_tavily_search`` for the agent tools and endpoints"""
+    async def fetch():
+        try:
+            client = get_http_pool().client(TAVILY_API_URL)
+            return _clean_tavily_results(await client.post("/search", json=_tavily_payload(query, max_results, api_key)))
+        except Exception as e:
+            logger.warning(f"Tavily search failed: {str(e)}")
+            return repr(e)
+
+    return await get_search_cache().aget_or_fetch(query, f"tavily:{max_results}", fetch)
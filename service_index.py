@@ -0,0 +1,184 @@
+"""
+Local semantic retrieval over the Vanlu service catalog
+
+Each service (name, description and keywords) is embedded once; the matrix
+of L2-normalized embeddings is saved as a ``.npy`` file and memory-mapped on
+the next start, so startup doesn't re-embed anything. A query is one
+embedding plus a matrix-vector product, which takes well under a millisecond
+for a catalog this size with the offline provider.
+
+Embedding providers are pluggable: ``hashing`` is deterministic and
+offline (feature hashing of words and character n-grams), ``openai`` uses
+``text-embedding-3-small``.
+"""
+
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import xxhash
+
+from embedding_cache import CachedEmbeddings, get_embedding_cache
+from models import ServiceInfo, VehicleCategory
+from text_folding import fold
+
+logger = logging.getLogger(__name__)
+
+# Extra vocabulary customers use for each service (pricing table keys)
+SERVICE_KEYWORDS = {
+    "Preventiva": ["lavagem simples", "limpeza rápida", "aspiração", "vidros", "manutenção semanal"],
+    "Premium": ["lavagem completa", "pneus", "pretinho", "plásticos ressecados", "brilho"],
+    "Master": ["lavagem detalhada", "polimento leve", "revitalização", "carro bem cuidado", "completo"],
+    "Polimento": ["arranhões", "riscos", "pintura opaca", "oxidação", "manchas na pintura", "brilho intenso"],
+    "Vitrificação": ["proteção da pintura", "cerâmica", "verniz", "longa duração", "carro novo", "repelir água"],
+    "Limpeza Interna": ["interior", "estofados", "carpete", "teto", "cheiro ruim", "sujeira por dentro"],
+    "Higienização de Bancos": ["bancos", "manchas nos bancos", "tecido", "couro", "ácaros", "alergia"]
+}
+
+class HashingEmbeddings:
+    """Deterministic offline embeddings: signed feature hashing of words and 4-grams"""
+
+    def __init__(self, dim: int = 512, ngram: int = 4):
+        self.name = f"hashing:{dim}"
+        self.dim = dim
+        self.ngram = ngram
+
+    def _features(self, text: str):
+        for word in fold(text).split():
+            word = "".join(char for char in word if char.isalnum())
+            if len(word) < 3:
+                continue
+            yield word, 1.0
+            padded = f"_{word}_"
+            for i in range(len(padded) - self.ngram + 1):
+                yield padded[i:i + self.ngram], 0.5
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                digest = xxhash.xxh64_intdigest(feature.encode("utf-8"))
+                vectors[row, digest % self.dim] += weight if digest & (1 << 63) else -weight
+        return vectors
+
+class OpenAIEmbeddings:
+    """OpenAI embeddings (network call per query)"""
+
+    def __init__(self, model: str = "text-embedding-3-small", api_key: Optional[str] = None):
+        from langchain_openai import OpenAIEmbeddings as LangChainOpenAIEmbeddings
+
+        self.name = f"openai:{model}"
+        self._client = LangChainOpenAIEmbeddings(model=model, api_key=api_key)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self._client.embed_documents(texts), dtype=np.float32)
+
+def get_embedding_provider(name: str = "hashing", cached: bool = True):
+    """Build an embedding provider by name, behind the shared embedding cache"""
+    if name == "hashing":
+        provider = HashingEmbeddings()
+    elif name == "openai":
+        provider = OpenAIEmbeddings(api_key=os.getenv("OPENAI_API_KEY"))
+    else:
+        raise ValueError(f"Unknown embeddings provider: {name}")
+    return CachedEmbeddings(provider, get_embedding_cache()) if cached else provider
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+@dataclass(frozen=True)
+class ServiceDocument:
+    key: str
+    service: ServiceInfo
+    text: str
+
+class ServiceIndex:
+    """Cosine-similarity index over service documents"""
+
+    def __init__(self, documents: List[ServiceDocument], provider, cache_dir: Optional[str] = "data/embeddings"):
+        self.documents = documents
+        self.provider = provider
+        self.cache_dir = cache_dir
+        self.source = "computed"
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.matrix = self._load_or_build()
+
+    @classmethod
+    def from_pricing(cls, service_pricing: Dict[str, ServiceInfo], provider,
+                     cache_dir: Optional[str] = "data/embeddings") -> "ServiceIndex":
+        """Index the services of the pricing table"""
+        documents = [
+            ServiceDocument(
+                key=key,
+                service=service,
+                text=f"{service.name}: {service.description or ''}. {', '.join(SERVICE_KEYWORDS.get(key, []))}"
+            )
+            for key, service in service_pricing.items()
+        ]
+        return cls(documents, provider, cache_dir)
+
+    def _cache_path(self) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        content = "\x00".join([self.provider.name] + [document.text for document in self.documents])
+        return os.path.join(self.cache_dir, f"services-{xxhash.xxh64_hexdigest(content.encode('utf-8'))}.npy")
+
+    def _load_or_build(self) -> np.ndarray:
+        path = self._cache_path()
+        if path and os.path.exists(path):
+            self.source = "mmap"
+            return np.load(path, mmap_mode="r")
+
+        matrix = _normalize(self.provider.embed([document.text for document in self.documents]))
+        if path:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path[:-4]}.{os.getpid()}.tmp.npy"
+            np.save(tmp_path, matrix)
+            os.replace(tmp_path, path)
+            logger.info(f"Saved {len(self.documents)} service embeddings to {path}")
+            return np.load(path, mmap_mode="r")
+        return matrix
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[ServiceDocument, float]]:
+        """Top-k services by cosine similarity"""
+        started = time.perf_counter()
+        vector = _normalize(self.provider.embed([query]))[0]
+        scores = self.matrix @ vector
+        k = min(k, len(self.documents))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        self.queries += 1
+        self.query_seconds += time.perf_counter() - started
+        return [(self.documents[i], float(scores[i])) for i in top]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics"""
+        return {
+            "documents": len(self.documents),
+            "dimensions": int(self.matrix.shape[1]),
+            "provider": self.provider.name,
+            "source": self.source,
+            "queries": self.queries,
+            "avg_query_ms": round(self.query_seconds / self.queries * 1000, 3) if self.queries else 0.0
+        }
+
+def format_service_results(results: List[Tuple[ServiceDocument, float]],
+                           category: Optional[VehicleCategory] = None) -> str:
+    """Render search results for the agent, priced for the vehicle category when known"""
+    lines = []
+    for document, score in results:
+        service = document.service
+        if category is None:
+            price = f"P R$ {service.price_p:.2f} / G R$ {service.price_g:.2f}"
+        else:
+            price = f"R$ {(service.price_g if category == VehicleCategory.GRANDE else service.price_p):.2f}"
+        lines.append(
+            f"- {service.name} ({price}, {service.duration_minutes} min): {service.description} [relevância {score:.2f}]"
+        )
+    return "\n".join(lines) if lines else "Nenhum serviço encontrado."
@@ -3,29 +3,179 @@ Business logic and services for Vanlu API
 """
 
 import asyncio
+import contextlib
+import functools
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Any, AsyncIterator, Tuple
+from urllib.parse import urlparse
+import httpx
+from tenacity import AsyncRetrying, RetryCallState, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from session_store import SessionBackend, ShardedSessionStore, SqliteSessionStore
+from search_cache import acached_tavily_search
+from http_clients import get_http_pool
+from coalescing import AsyncSingleFlight
+from crawler import CrawlEngine
+from competitor_extraction import CompetitorExtractor, assess, competitor_name
+from competitor_snapshots import CompetitorSnapshot, CompetitorSnapshotStore
+from scrape_cache import PageValidators, ScrapeCache
+from fast_path import FastPathRouter
+from intents import detect_intent, detect_intents
+from text_folding import fold
+from response_templates import ResponseTemplates
+from vehicle_catalog import get_vehicle_catalog
 from models import (
     VehicleInfo, ServiceInfo, ServiceType, VehicleCategory,
     ChatResponse, AppointmentRequest, AppointmentResponse,
     ScrapeRequest, ScrapeResponse, CrawlRequest, CrawlResponse,
-    SearchResult, CompetitorAnalysis
+    CompetitorAnalysis, APIConfiguration
 )
 import os
 import json
-import hashlib
+import xxhash
 
 logger = logging.getLogger(__name__)
 
-class LucianoAgentService:
-    """Service for managing Luciano agent interactions"""
+class AgentRunner:
+    """Runs LangGraph agent turns without blocking the event loop
+
+    At most ``max_concurrency`` turns talk to the LLM at the same time; the
+    remaining callers wait on the semaphore instead of piling up requests
+    against the OpenAI rate limit.
+    """
+
+    def __init__(self, graph, max_concurrency: int = 8):
+        self.graph = graph
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+
+    @contextlib.asynccontextmanager
+    async def _slot(self):
+        """Wait for a free concurrency slot and track its usage"""
+        self.waiting += 1
+        async with self._semaphore:
+            self.waiting -= 1
+            self.in_flight += 1
+            try:
+                yield
+            except Exception:
+                self.failed += 1
+                raise
+            finally:
+                self.in_flight -= 1
+        self.completed += 1
+
+    async def ainvoke(self, payload: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run one agent turn, preferring the graph's native async API"""
+        async with self._slot():
+            if hasattr(self.graph, "ainvoke"):
+                return await self.graph.ainvoke(payload, config=config)
+
+            # Sync-only graphs are offloaded to the default thread pool
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None, functools.partial(self.graph.invoke, payload, config=config)
+            )
+
+    async def astream(self, payload: Dict[str, Any], config: Optional[Dict[str, Any]] = None,
+                      stream_mode: Any = ("messages", "updates")) -> AsyncIterator[Any]:
+        """Stream one agent turn; the slot is held until the stream ends"""
+        async with self._slot():
+            async for chunk in self.graph.astream(payload, config=config, stream_mode=list(stream_mode)):
+                yield chunk
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get concurrency statistics"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed
+        }
+
+class ConversationStats:
+    """Running conversation aggregates, updated as chats and appointments happen
 
-    def __init__(self, graph, tools):
+    Analytics read these counters instead of rescanning every session, so
+    their cost doesn't grow with traffic. Counts are cumulative for the
+    process, evicted and deleted sessions included.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.conversations = 0
+        self.completed_appointments = 0
+        self.intents: Counter = Counter()
+        self.vehicles: Counter = Counter()
+
+    def record_conversation(self):
+        """A new conversation started"""
+        with self._lock:
+            self.conversations += 1
+
+    def record_intent(self, intent: str):
+        """A customer message was classified"""
+        with self._lock:
+            self.intents[intent] += 1
+
+    def record_appointment(self, vehicle_model: str):
+        """A conversation ended with a confirmed appointment"""
+        with self._lock:
+            self.completed_appointments += 1
+            self.vehicles[vehicle_model] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current aggregates"""
+        with self._lock:
+            conversion_rate = (
+                self.completed_appointments / self.conversations * 100 if self.conversations > 0 else 0
+            )
+            return {
+                "total_conversations": self.conversations,
+                "completed_appointments": self.completed_appointments,
+                "conversion_rate": round(conversion_rate, 2),
+                "top_intents": self.intents.most_common(5),
+                "popular_vehicles": self.vehicles.most_common(10)
+            }
+
+class LucianoAgentService:
+    """Service for managing Luciano agent interactions
+
+    Turn locks, conversation stats and history summaries live in this
+    process. With several workers a session must stay on one worker
+    (sticky routing by session_id); the SQLite session store only makes the
+    session rows shared, and with the in-memory checkpointer the history of
+    a session that moves to another worker is lost.
+    """
+
+    def __init__(self, graph, tools, runner: Optional[AgentRunner] = None, history_manager=None,
+                 session_store: Optional[SessionBackend] = None, enable_fast_path: bool = True,
+                 enable_templates: bool = True):
         self.graph = graph
         self.tools = tools
-        self.sessions: Dict[str, Dict] = {}
+        self.runner = runner or AgentRunner(graph)
+        self.history_manager = history_manager
+        self.sessions = session_store if session_store is not None else ShardedSessionStore()
+        self.sessions.on_evict = self._release_session
+        self._pending_releases = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # One turn at a time per session; a lock lives only while turns hold or wait for it
+        self._turn_locks: Dict[str, asyncio.Lock] = {}
+        self._turn_users: Counter = Counter()
         self.service_pricing = self._load_service_pricing()
+        self.fast_path = FastPathRouter(self.service_pricing, self._detect_intent) if enable_fast_path else None
+        self.templates = ResponseTemplates() if enable_templates else None
+        self.stats = ConversationStats()
 
     def _load_service_pricing(self) -> Dict[str, ServiceInfo]:
         """Load service pricing and information"""
@@ -88,84 +238,263 @@ class LucianoAgentService:
             )
         }
 
-    async def chat(self, message: str, session_id: Optional[str] = None) -> ChatResponse:
-        """Process chat message with Luciano agent"""
-        try:
-            # Generate or use existing session ID
-            if not session_id:
-                session_id = self._generate_session_id()
-
-            # Get or create session
-            if session_id not in self.sessions:
-                self.sessions[session_id] = {
-                    "messages": [],
-                    "created_at": datetime.now(),
-                    "last_activity": datetime.now(),
-                    "stage": "initial",  # initial, system_choice, whatsapp_attendance, completed
-                    "customer_data": {}
-                }
-
-            session = self.sessions[session_id]
-            session["last_activity"] = datetime.now()
-
-            # Add message to session
-            from langchain_core.messages import HumanMessage, AIMessage
-            session["messages"].append(HumanMessage(content=message))
-
-            # Get response from agent
-            config = {"configurable": {"thread_id": session_id}}
-            result = self.graph.invoke(
-                {"messages": session["messages"]},
-                config=config
-            )
+    @contextlib.asynccontextmanager
+    async def _session_turn(self, session_id: str):
+        """Serialize the turns of a session (start -> graph run -> finish)
 
-            # Extract response
-            agent_response = result["messages"][-1].content
-            session["messages"].append(AIMessage(content=agent_response))
+        Concurrent turns on one checkpoint thread would each run against the
+        same history and drop each other's messages.
+        """
+        lock = self._turn_locks.setdefault(session_id, asyncio.Lock())
+        self._turn_users[session_id] += 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._turn_users[session_id] -= 1
+            if not self._turn_users[session_id]:
+                del self._turn_users[session_id]
+                if self._turn_locks.get(session_id) is lock:
+                    del self._turn_locks[session_id]
+
+    async def _get_or_create_session(self, session_id: Optional[str]) -> tuple:
+        """Get an existing session or create a new one"""
+        # Evictions from store calls in worker threads are released on this loop
+        self._loop = asyncio.get_running_loop()
+
+        # Generate or use existing session ID
+        if not session_id:
+            session_id = self._generate_session_id()
+
+        # Get or create session (atomic within the session's shard)
+        await self.sessions.aget_or_create(session_id, self._new_session)
+        session = await self.sessions.atouch(session_id)
+        return session_id, session
+
+    def _new_session(self) -> Dict:
+        """Build the state of a new session"""
+        return {
+            "messages": [],  # only used when the graph has no checkpointer
+            "message_count": 0,
+            "intents": {},
+            "created_at": datetime.now(),
+            "last_activity": datetime.now(),
+            "stage": "initial",  # initial, system_choice, attendance, whatsapp_attendance, completed
+            "customer_data": {}
+        }
 
-            # Analyze intent and detect next action
-            intent_detected = self._detect_intent(message)
-            next_action = self._determine_next_action(session, agent_response)
+    @property
+    def uses_checkpointer(self) -> bool:
+        """Whether conversation history lives in the graph checkpointer"""
+        return isinstance(getattr(self.graph, "checkpointer", None), BaseCheckpointSaver)
 
-            return ChatResponse(
-                response=agent_response,
-                session_id=session_id,
-                intent_detected=intent_detected,
-                next_action=next_action
+    def set_graph(self, graph):
+        """Swap the agent graph (e.g. once a checkpointer has been opened)"""
+        self.graph = graph
+        self.runner.graph = graph
+
+    def _start_turn(self, session: Dict, message: str) -> Dict[str, Any]:
+        """Build the graph input for this turn (the session is only updated in _finish_turn)"""
+        human_message = HumanMessage(content=message)
+        if self.uses_checkpointer:
+            # History is restored from the checkpoint, send only the delta
+            return {"messages": [human_message]}
+        return {"messages": session["messages"] + [human_message]}
+
+    async def _finish_turn(self, session: Dict, session_id: str, message: str, agent_response: str,
+                     stage: str) -> ChatResponse:
+        """Record the exchange (the reply only if there is one) and build the chat response
+
+        ``stage`` is the session stage before this turn; a change made by the
+        templates is carried over to the stored session.
+        """
+        exchange = [HumanMessage(content=message)]
+        if agent_response:
+            exchange.append(AIMessage(content=agent_response))
+        intent_detected = self._detect_intent(message)
+
+        def apply(stored: Dict):
+            if stored["message_count"] == 0:
+                self.stats.record_conversation()
+            stored["message_count"] += len(exchange)
+            if not self.uses_checkpointer:
+                stored["messages"].extend(exchange)
+            stored["intents"][intent_detected] = stored["intents"].get(intent_detected, 0) + 1
+            if session.get("stage") != stage:
+                stored["stage"] = session["stage"]
+            stored["last_activity"] = datetime.now()
+
+        # Applied to the stored session, not our copy: persistent stores may be
+        # shared with other workers (in-memory stores hand out the live dict)
+        if await self.sessions.aupdate(session_id, apply) is None:
+            # The session left the store mid-turn
+            apply(session)
+
+        next_action = self._determine_next_action(session, agent_response)
+        self.stats.record_intent(intent_detected)
+
+        return ChatResponse(
+            response=agent_response,
+            session_id=session_id,
+            intent_detected=intent_detected,
+            next_action=next_action
+        )
+
+    def _canned_reply(self, session: Dict, message: str) -> Optional[str]:
+        """Reply without the LLM: scripted step, else a confident price/catalog answer"""
+        if self.templates is not None:
+            reply = self.templates.reply(session, message)
+            if reply is not None:
+                return reply
+
+        # The first turn belongs to the greeting, never the pricing table
+        if self.fast_path is None or session["message_count"] == 0:
+            return None
+        return self.fast_path.route(message)
+
+    async def _record_exchange(self, session_id: str, payload: Dict[str, Any], reply: str):
+        """Write a reply produced outside the graph into the checkpointed thread"""
+        if self.uses_checkpointer:
+            await self.graph.aupdate_state(
+                {"configurable": {"thread_id": session_id}},
+                {"messages": payload["messages"] + [AIMessage(content=reply)]},
+                as_node="agent"
             )
 
+    async def chat(self, message: str, session_id: Optional[str] = None) -> ChatResponse:
+        """Process chat message with Luciano agent"""
+        try:
+            session_id = session_id or self._generate_session_id()
+            async with self._session_turn(session_id):
+                return await self._chat_turn(message, session_id)
+
         except Exception as e:
             logger.error(f"Error in chat service: {str(e)}")
             raise
 
+    async def _chat_turn(self, message: str, session_id: str) -> ChatResponse:
+        """One chat turn; the caller holds the session's turn lock"""
+        session_id, session = await self._get_or_create_session(session_id)
+        stage = session["stage"]
+
+        canned_reply = self._canned_reply(session, message)
+        if canned_reply is not None:
+            await self._record_exchange(session_id, self._start_turn(session, message), canned_reply)
+            return await self._finish_turn(session, session_id, message, canned_reply, stage)
+
+        # Get response from agent
+        started = time.perf_counter()
+        config = {"configurable": {"thread_id": session_id}}
+        result = await self.runner.ainvoke(
+            self._start_turn(session, message),
+            config=config
+        )
+        if self.fast_path is not None:
+            self.fast_path.record_llm_turn(time.perf_counter() - started)
+
+        # Extract response
+        agent_response = result["messages"][-1].content
+
+        return await self._finish_turn(session, session_id, message, agent_response, stage)
+
+    async def chat_stream(self, message: str, session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Process chat message streaming tokens and tool progress events
+
+        Yields ``{"event": ..., "data": {...}}`` dicts: ``session`` first,
+        then ``token``, ``tool_call`` and ``tool_result`` as the agent runs,
+        and finally ``done`` carrying the full ChatResponse.
+        """
+        session_id = session_id or self._generate_session_id()
+        async with self._session_turn(session_id), \
+                contextlib.aclosing(self._chat_stream_turn(message, session_id)) as events:
+            async for event in events:
+                yield event
+
+    async def _chat_stream_turn(self, message: str, session_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """One streamed chat turn; the caller holds the session's turn lock"""
+        session_id, session = await self._get_or_create_session(session_id)
+        stage = session["stage"]
+        canned_reply = self._canned_reply(session, message)
+        payload = self._start_turn(session, message)
+        agent_response = ""
+        graph_started = finished = False
+        try:
+            yield {"event": "session", "data": {"session_id": session_id}}
+
+            if canned_reply is not None:
+                agent_response = canned_reply
+                graph_started = True
+                await self._record_exchange(session_id, payload, canned_reply)
+                yield {"event": "token", "data": {"content": canned_reply}}
+                response = await self._finish_turn(session, session_id, message, canned_reply, stage)
+                finished = True
+                yield {"event": "done", "data": response.model_dump(mode="json")}
+                return
+
+            started = time.perf_counter()
+            config = {"configurable": {"thread_id": session_id}}
+            graph_started = True
+            try:
+                async for mode, chunk in self.runner.astream(payload, config=config):
+                    if mode == "messages":
+                        message_chunk, _metadata = chunk
+                        if isinstance(message_chunk, AIMessage) and isinstance(message_chunk.content, str) \
+                                and message_chunk.content:
+                            yield {"event": "token", "data": {"content": message_chunk.content}}
+                        continue
+
+                    # "updates" mode: one entry per node that finished a step
+                    for node, update in chunk.items():
+                        for node_message in (update or {}).get("messages", []):
+                            if isinstance(node_message, AIMessage) and node_message.tool_calls:
+                                for tool_call in node_message.tool_calls:
+                                    yield {"event": "tool_call", "data": {
+                                        "id": tool_call.get("id"),
+                                        "name": tool_call.get("name"),
+                                        "args": tool_call.get("args", {})
+                                    }}
+                            elif isinstance(node_message, AIMessage):
+                                agent_response = node_message.content
+                            elif isinstance(node_message, ToolMessage):
+                                yield {"event": "tool_result", "data": {
+                                    "id": node_message.tool_call_id,
+                                    "name": node_message.name,
+                                    "status": getattr(node_message, "status", "success")
+                                }}
+
+            except Exception as e:
+                logger.error(f"Error in chat stream: {str(e)}")
+                yield {"event": "error", "data": {"session_id": session_id, "detail": str(e)}}
+                return
+
+            if self.fast_path is not None:
+                self.fast_path.record_llm_turn(time.perf_counter() - started)
+            response = await self._finish_turn(session, session_id, message, agent_response, stage)
+            finished = True
+            yield {"event": "done", "data": response.model_dump(mode="json")}
+
+        finally:
+            if not finished:
+                # Client disconnected or the agent failed mid-turn
+                logger.info(f"Chat stream for {session_id} ended before the reply was complete")
+                if graph_started:
+                    # The checkpoint may already hold the message: record it, with the reply if it finished
+                    await self._finish_turn(session, session_id, message, agent_response, stage)
+                else:
+                    # Nothing was recorded yet; undo the template's stage change
+                    session["stage"] = stage
+
     def _generate_session_id(self) -> str:
         """Generate unique session ID"""
-        timestamp = str(datetime.now().timestamp())
-        hash_object = hashlib.md5(timestamp.encode())
-        return f"session_{hash_object.hexdigest()[:12]}"
+        return self.sessions.new_session_id()
 
     def _detect_intent(self, message: str) -> str:
         """Detect user intent from message"""
-        message_lower = message.lower()
-
-        # Price-related intents
-        if any(word in message_lower for word in ['quanto', 'preço', 'valor', 'custa', 'sai']):
-            return 'price_inquiry'
-
-        # Service-related intents
-        if any(word in message_lower for word in ['serviço', 'fazem', 'faz', 'tipo']):
-            return 'service_inquiry'
-
-        # Scheduling intents
-        if any(word in message_lower for word in ['agendar', 'horário', 'agenda', 'vaga', 'marcar']):
-            return 'scheduling'
-
-        # Information intents
-        if any(word in message_lower for word in ['endereço', 'localização', 'contato', 'telefone']):
-            return 'contact_info'
+        return detect_intent(message)
 
-        # General inquiry
-        return 'general_inquiry'
+    def detect_intents(self, messages: List[str]) -> List[str]:
+        """Detect the intent of many messages in one pass"""
+        return detect_intents(messages)
 
     def _determine_next_action(self, session: Dict, agent_response: str) -> Optional[str]:
         """Determine next action based on session and response"""
@@ -194,32 +523,292 @@ class LucianoAgentService:
         """Get session information"""
         return self.sessions.get(session_id)
 
-    def get_all_sessions(self) -> Dict[str, Dict]:
+    def save_session(self, session_id: str, session: Dict):
+        """Persist changes made to a session returned by get_session_info"""
+        self.sessions.save(session_id, session)
+
+    def confirm_appointment(self, session_id: str, session: Dict, appointment: AppointmentRequest, price: float):
+        """Store a confirmed appointment in its session and count it"""
+        already_confirmed = session.get("customer_data", {}).get("appointment_confirmed", False)
+        session["customer_data"] = {
+            "appointment": appointment.dict(),
+            "appointment_confirmed": True,
+            "total_price": price
+        }
+        session["stage"] = "completed"
+        self.sessions.save(session_id, session)
+
+        # Rescheduling doesn't make it a second conversion
+        if not already_confirmed:
+            match = get_vehicle_catalog().lookup(appointment.vehicle.model)
+            self.stats.record_appointment(match.model if match else appointment.vehicle.model.strip().title())
+
+    def get_all_sessions(self) -> SessionBackend:
         """Get all active sessions"""
         return self.sessions
 
-    def cleanup_expired_sessions(self, timeout_hours: int = 24):
-        """Remove expired sessions"""
-        current_time = datetime.now()
-        expired_sessions = []
+    async def get_session_messages(self, session_id: str) -> List[Any]:
+        """Get the conversation history of a session"""
+        if self.uses_checkpointer:
+            state = await self.graph.aget_state({"configurable": {"thread_id": session_id}})
+            return state.values.get("messages", [])
 
-        for session_id, session in self.sessions.items():
-            if current_time - session["last_activity"] > timedelta(hours=timeout_hours):
-                expired_sessions.append(session_id)
+        session = self.sessions.get(session_id)
+        return session["messages"] if session else []
 
-        for session_id in expired_sessions:
-            del self.sessions[session_id]
+    async def delete_session(self, session_id: str) -> bool:
+        """Delete a session and its checkpointed history"""
+        if session_id not in self.sessions:
+            return False
 
-        logger.info(f"Cleaned up {len(expired_sessions)} expired sessions")
+        del self.sessions[session_id]
+        return True
 
-class WebScrapingService:
-    """Service for web scraping operations using MCP Firecrawl"""
+    def get_session_tokens(self, session_id: str) -> Optional[Dict[str, int]]:
+        """Get prompt token counts of the last turn of a session"""
+        if not self.history_manager:
+            return None
+        return self.history_manager.get_thread_stats(session_id)
 
-    def __init__(self):
-        self.api_key = os.getenv("FIRECRAWL_API_KEY")
-        self.base_url = "https://api.firecrawl.dev/v1"
+    def _release_session(self, session_id: str, session: Dict):
+        """Free state kept outside the store for a session that left it"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if loop is None and self._loop is not None and self._loop.is_running():
+            # Evicted by a store call running in a worker thread (aget_or_create)
+            self._loop.call_soon_threadsafe(self._release_session, session_id, session)
+            return
+
+        if self.history_manager:
+            self.history_manager.forget(session_id)
+        if not self.uses_checkpointer:
+            return
+
+        if loop is None:
+            self.graph.checkpointer.delete_thread(session_id)
+            return
+
+        # Evictions happen inside request handlers; delete the thread in the background
+        task = loop.create_task(self.graph.checkpointer.adelete_thread(session_id))
+        self._pending_releases.add(task)
+        task.add_done_callback(self._pending_releases.discard)
+
+    async def shutdown(self):
+        """Finish pending checkpoint deletes and close the session store"""
+        if self._pending_releases:
+            await asyncio.gather(*self._pending_releases, return_exceptions=True)
+        if hasattr(self.sessions, "close"):
+            self.sessions.close()
+
+    def cleanup_expired_sessions(self, timeout_hours: Optional[float] = None):
+        """Remove expired sessions (defaults to the store's session timeout)"""
+        ttl_seconds = timeout_hours * 3600 if timeout_hours is not None else None
+        expired = self.sessions.expire(ttl_seconds)
+
+        logger.info(f"Cleaned up {expired} expired sessions")
+        return expired
+
+class WebScrapingService:
+    """Service for web scraping operations using the Firecrawl v1 API
+
+    Scrapes go through the pooled Firecrawl client. At most
+    ``max_concurrency_per_host`` scrapes of the same site run at once, so a
+    batch of competitor pages doesn't hammer one website, and transient
+    failures (network errors, timeouts, 429 and 5xx) are retried with
+    exponential backoff.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_concurrency_per_host: int = 4,
+        timeout: float = 60.0,
+        max_retries: int = 3,
+        crawl_workers_per_job: int = 4,
+        crawl_max_running_jobs: int = 2,
+        cache: Optional[ScrapeCache] = None
+    ):
+        self.api_key = api_key or os.getenv("FIRECRAWL_API_KEY")
+        self.base_url = base_url or os.getenv("FIRECRAWL_API_URL") or "https://api.firecrawl.dev/v1"
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self.timeout = timeout
+        self.max_retries = max_retries
+        # Identical concurrent scrapes share one Firecrawl call
+        self._scrape_flight = AsyncSingleFlight()
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Counter = Counter()
+        self.scrapes = 0
+        self.failures = 0
+        self.retries = 0
+        self.scrape_seconds = 0.0
+        self.cache = cache or ScrapeCache()
+        self.crawler = CrawlEngine(
+            self._scrape_crawl_page, workers_per_job=crawl_workers_per_job, max_running_jobs=crawl_max_running_jobs
+        )
 
     async def scrape_url(self, request: ScrapeRequest) -> ScrapeResponse:
+        """Scrape a single URL (cached; concurrent identical requests are coalesced)"""
+        key = xxhash.xxh64_hexdigest(request.model_dump_json().encode("utf-8"))
+        return await self._scrape_flight.do(key, lambda: self._cached_scrape(request, probe=True))
+
+    async def _scrape_crawl_page(self, request: ScrapeRequest) -> ScrapeResponse:
+        """Scrape a crawl page: cached, but never probed (that would be one more GET per page)"""
+        key = xxhash.xxh64_hexdigest(request.model_dump_json().encode("utf-8"))
+        return await self._scrape_flight.do(key, lambda: self._cached_scrape(request, probe=False))
+
+    async def _cached_scrape(self, request: ScrapeRequest, probe: bool) -> ScrapeResponse:
+        """Serve a fresh or revalidated cached scrape, or scrape and cache"""
+        if not self.api_key or self.cache.max_age(request) <= 0:
+            return await self._scrape_url(request)
+
+        key = self.cache.make_key(request)
+        entry = self.cache.get(key)
+        validators, probed = None, False
+        if entry is not None:
+            if entry.age < self.cache.max_age(request):
+                self.cache.hits += 1
+                return self.cache.response(entry)
+            if probe and entry.validators is not None:
+                unchanged, validators = await self._probe_page(request.url, entry.validators)
+                probed = True
+                if unchanged:
+                    self.cache.revalidated += 1
+                    self.cache.touch(entry, validators)
+                    return self.cache.response(entry)
+            self.cache.changed += 1
+        else:
+            self.cache.misses += 1
+
+        if probe and not probed:
+            # Record the page's validators while Firecrawl scrapes it
+            result, (_, validators) = await asyncio.gather(
+                self._scrape_url(request), self._probe_page(request.url, None)
+            )
+        else:
+            result = await self._scrape_url(request)
+
+        if result.success:
+            self.cache.put(key, result, validators)
+        return result
+
+    async def _probe_page(self, url: str, previous: Optional[PageValidators]):
+        """Conditional GET of a page: (unchanged since ``previous``, current validators)
+
+        The content hash is of the raw body, so it only matches for static
+        pages; pages that embed timestamps, tokens or rotating content look
+        changed every time and only ETag/Last-Modified can spare a re-scrape.
+        """
+        # One client for probes of every site, rather than a pooled client per competitor host
+        client = get_http_pool().client("")
+        try:
+            async with self._host_slot(url):
+                response = await client.get(
+                    url,
+                    headers=previous.conditional_headers() if previous else {},
+                    follow_redirects=True,
+                    timeout=httpx.Timeout(15.0, connect=5.0)
+                )
+        except Exception as e:
+            # A failed probe only costs the cache its validators, never the scrape
+            logger.warning(f"Could not revalidate {url}: {e!r}")
+            return False, None
+
+        if response.status_code == 304:
+            return previous is not None, previous
+        if response.status_code >= 400:
+            return False, None
+
+        validators = PageValidators(
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+            content_hash=xxhash.xxh3_64_hexdigest(response.content)
+        )
+        unchanged = previous is not None and previous.content_hash == validators.content_hash
+        return unchanged, validators
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get scraping statistics"""
+        return {
+            "scrapes": self.scrapes,
+            "failures": self.failures,
+            "retries": self.retries,
+            "avg_scrape_ms": round(self.scrape_seconds / self.scrapes * 1000, 1) if self.scrapes else 0.0,
+            "max_concurrency_per_host": self.max_concurrency_per_host,
+            "in_flight_by_host": {host: count for host, count in self._in_flight.items() if count},
+            "coalescing": self._scrape_flight.get_stats(),
+            "crawls": self.crawler.get_stats(),
+            "cache": self.cache.get_stats()
+        }
+
+    @contextlib.asynccontextmanager
+    async def _host_slot(self, url: str):
+        """Wait for a free scrape slot for the URL's host"""
+        host = urlparse(url).netloc.lower()
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._host_semaphores[host] = asyncio.Semaphore(self.max_concurrency_per_host)
+        async with semaphore:
+            self._in_flight[host] += 1
+            try:
+                yield
+            finally:
+                self._in_flight[host] -= 1
+
+    def _scrape_payload(self, request: ScrapeRequest) -> Dict[str, Any]:
+        payload = {
+            "url": request.url,
+            "formats": request.formats,
+            "onlyMainContent": request.only_main_content,
+            # Firecrawl's own page timeout, in milliseconds
+            "timeout": int(self.timeout * 1000)
+        }
+        if request.wait_for is not None:
+            payload["waitFor"] = request.wait_for
+        if request.actions:
+            payload["actions"] = request.actions
+        return payload
+
+    @staticmethod
+    def _is_transient(error: BaseException) -> bool:
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code == 429 or error.response.status_code >= 500
+        return isinstance(error, httpx.TransportError)
+
+    def _before_retry(self, retry_state: RetryCallState):
+        self.retries += 1
+        logger.warning(
+            f"Retrying Firecrawl scrape (attempt {retry_state.attempt_number + 1}): {retry_state.outcome.exception()!r}"
+        )
+
+    async def _post_scrape(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        client = get_http_pool().client(self.base_url)
+        # Leave Firecrawl room to hit its own page timeout first
+        timeout = httpx.Timeout(self.timeout + 10, connect=5.0)
+
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(self.max_retries + 1),
+            wait=wait_exponential_jitter(initial=0.5, max=8),
+            retry=retry_if_exception(self._is_transient),
+            before_sleep=self._before_retry,
+            reraise=True
+        ):
+            with attempt:
+                # The host slot is only held while a request is in flight, not during backoff
+                async with self._host_slot(url):
+                    response = await client.post(
+                        "/scrape",
+                        json=payload,
+                        headers={"Authorization": f"Bearer {self.api_key}"},
+                        timeout=timeout
+                    )
+                response.raise_for_status()
+                return response.json()
+
+    async def _scrape_url(self, request: ScrapeRequest) -> ScrapeResponse:
         """Scrape a single URL"""
         try:
             if not self.api_key:
@@ -230,13 +819,34 @@ class WebScrapingService:
                     content={}
                 )
 
-            # TODO: Implement MCP Firecrawl integration
-            # This is a placeholder implementation
+            started = time.perf_counter()
+            try:
+                body = await self._post_scrape(request.url, self._scrape_payload(request))
+            except Exception:
+                self.failures += 1
+                raise
+            finally:
+                self.scrapes += 1
+                self.scrape_seconds += time.perf_counter() - started
+
+            if not body.get("success", True):
+                self.failures += 1
+                return ScrapeResponse(
+                    success=False,
+                    message=body.get("error") or "Firecrawl scrape failed",
+                    url=request.url,
+                    content={}
+                )
+
+            data = body.get("data") or {}
+            metadata = data.pop("metadata", None)
+
             return ScrapeResponse(
                 success=True,
-                message="MCP Firecrawl integration coming soon",
+                message="URL scraped successfully",
                 url=request.url,
-                content={"status": "placeholder"}
+                content=data,
+                metadata=metadata
             )
 
         except Exception as e:
@@ -244,7 +854,7 @@ class WebScrapingService:
             raise
 
     async def crawl_website(self, request: CrawlRequest) -> CrawlResponse:
-        """Crawl an entire website"""
+        """Start crawling a website in the background"""
         try:
             if not self.api_key:
                 return CrawlResponse(
@@ -254,14 +864,12 @@ class WebScrapingService:
                     status="failed"
                 )
 
-            # TODO: Implement MCP Firecrawl crawling
-            # This is a placeholder implementation
-            crawl_id = f"crawl_{datetime.now().timestamp()}"
+            job = self.crawler.start(request)
 
             return CrawlResponse(
                 success=True,
                 message="Crawl started successfully",
-                crawl_id=crawl_id,
+                crawl_id=job.crawl_id,
                 status="started"
             )
 
@@ -269,11 +877,89 @@ class WebScrapingService:
             logger.error(f"Error in crawl service: {str(e)}")
             raise
 
+    def get_crawl(self, crawl_id: str) -> Optional[CrawlResponse]:
+        """Status and results of a crawl, or None if unknown"""
+        job = self.crawler.get(crawl_id)
+        if job is None:
+            return None
+
+        messages = {
+            "started": "Crawl queued",
+            "running": "Crawl in progress",
+            "completed": "Crawl completed",
+            "failed": f"Crawl failed{': ' + job.error if job.error else ''}"
+        }
+        return CrawlResponse(
+            success=job.status != "failed",
+            message=messages[job.status],
+            crawl_id=job.crawl_id,
+            status=job.status,
+            pages_scraped=len(job.results),
+            pages_failed=job.pages_failed,
+            results=list(job.results)
+        )
+
+    async def shutdown(self):
+        """Cancel background crawls"""
+        await self.crawler.shutdown()
+
 class CompetitorAnalysisService:
     """Service for competitor analysis and market research"""
 
-    def __init__(self, scraping_service: WebScrapingService):
+    def __init__(self, scraping_service: WebScrapingService, max_concurrency: int = 20,
+                 snapshot_options: Optional[Dict[str, Any]] = None):
         self.scraping_service = scraping_service
+        self.max_concurrency = max_concurrency
+        self.extractor = CompetitorExtractor()
+        self.snapshots = CompetitorSnapshotStore(self.build_snapshot, analyze=self.analyze_snapshot,
+                                                 **(snapshot_options or {}))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get competitor analysis statistics"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "extraction_cache": self.extractor.get_stats(),
+            "snapshots": self.snapshots.get_stats()
+        }
+
+    async def build_snapshot(self, location: str) -> CompetitorSnapshot:
+        """Search a location's competitors (their sites are analyzed afterwards by analyze_snapshot)"""
+        return CompetitorSnapshot(location=location, competitors=await self.search_competitors(location))
+
+    async def analyze_snapshot(self, snapshot: CompetitorSnapshot) -> Dict[str, Dict[str, Any]]:
+        """Analyze the sites of a snapshot's competitors, keyed by URL"""
+        analyses = {}
+        if self.scraping_service.api_key:
+            urls = [competitor["url"] for competitor in snapshot.competitors]
+            async for analysis in self.analyze_competitors(urls):
+                analyses[analysis.website] = analysis.model_dump(mode="json")
+        return analyses
+
+    async def find_competitors(self, location: str, query: str = "",
+                               limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], CompetitorSnapshot]:
+        """Competitors from the location's snapshot matching ``query``, best matches first"""
+        snapshot = await self.snapshots.get(location)
+        terms = [term for term in fold(query).split() if len(term) >= 3]
+
+        matches = []
+        for competitor in snapshot.competitors:
+            analysis = snapshot.analyses.get(competitor["url"])
+            result = {**competitor, "analysis": analysis} if analysis else dict(competitor)
+            if not terms:
+                matches.append((0, result))
+                continue
+            haystack = fold(" ".join([
+                competitor.get("name", ""), competitor.get("snippet", ""), competitor.get("url", ""),
+                " ".join(analysis["services_offered"]) if analysis else ""
+            ]))
+            score = sum(1 for term in terms if term in haystack)
+            if score:
+                matches.append((score, result))
+
+        # Stable sort keeps the search ranking among equal scores
+        matches.sort(key=lambda match: -match[0])
+        results = [result for _, result in matches]
+        return (results[:limit] if limit else results), snapshot
 
     async def analyze_competitor(self, competitor_url: str) -> CompetitorAnalysis:
         """Analyze a competitor website"""
@@ -300,39 +986,70 @@ class CompetitorAnalysisService:
                     weaknesses=[]
                 )
 
-            # TODO: Implement competitor analysis logic
-            # Extract services, prices, contact info, etc.
-            content = scrape_result.content
+            markdown = scrape_result.content.get("markdown") or ""
+            extraction = self.extractor.extract(markdown)
+            strengths, weaknesses = assess(extraction)
 
             return CompetitorAnalysis(
                 success=True,
-                competitor_name="Analysis Pending",
+                competitor_name=competitor_name(competitor_url, scrape_result.metadata),
                 website=competitor_url,
-                services_offered=[],
-                price_ranges={},
-                contact_info={},
-                strengths=[],
-                weaknesses=[]
+                services_offered=list(extraction.services),
+                price_ranges=extraction.price_ranges,
+                contact_info=extraction.contact_info,
+                strengths=strengths,
+                weaknesses=weaknesses
             )
 
         except Exception as e:
             logger.error(f"Error in competitor analysis: {str(e)}")
             raise
 
+    async def analyze_competitors(self, urls: List[str]) -> AsyncIterator[CompetitorAnalysis]:
+        """Analyze many competitors concurrently, yielding each analysis as soon as it is ready"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def analyze(url: str) -> CompetitorAnalysis:
+            async with semaphore:
+                try:
+                    return await self.analyze_competitor(url)
+                except Exception as e:
+                    # One bad site must not abort the whole batch
+                    return CompetitorAnalysis(
+                        success=False,
+                        message=f"Failed to analyze competitor: {str(e)}",
+                        competitor_name="Unknown",
+                        website=url,
+                        services_offered=[],
+                        price_ranges={},
+                        contact_info={},
+                        strengths=[],
+                        weaknesses=[]
+                    )
+
+        tasks = [asyncio.create_task(analyze(url)) for url in urls]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The client may disconnect mid-stream
+            for task in tasks:
+                task.cancel()
+
     async def search_competitors(self, location: str = "Aracaju") -> List[Dict[str, Any]]:
         """Search for competitors in a specific location"""
         try:
-            # Use Tavily search to find competitors
-            from langchain_community.tools.tavily_search import TavilySearchResults
-
+            # Use Tavily search to find competitors (shared result cache)
             tavily_api_key = os.getenv("TAVILY_API_KEY")
             if not tavily_api_key:
                 raise ValueError("TAVILY_API_KEY not configured")
 
-            search_tool = TavilySearchResults(max_results=10, api_key=tavily_api_key)
             query = f"estética automotiva detalhe carros {location} concorrentes empresas"
 
-            results = search_tool.invoke(query)
+            results = await acached_tavily_search(query, max_results=10, api_key=tavily_api_key)
+            if isinstance(results, str):
+                # Tavily errors come back as text; don't mistake them for "no competitors"
+                raise RuntimeError(f"Tavily search failed: {results}")
 
             # Process and structure results
             competitors = []
@@ -358,36 +1075,10 @@ class AnalyticsService:
         self.agent_service = agent_service
 
     def get_conversation_analytics(self) -> Dict[str, Any]:
-        """Get conversation analytics"""
-        sessions = self.agent_service.get_all_sessions()
-
-        total_conversations = len(sessions)
-        completed_appointments = 0
-
-        intents = {}
-        vehicle_models = {}
-
-        for session in sessions.values():
-            # Count intents
-            for message in session.get("messages", []):
-                if hasattr(message, 'content'):
-                    intent = self.agent_service._detect_intent(message.content)
-                    intents[intent] = intents.get(intent, 0) + 1
-
-            # Check if appointment was completed
-            customer_data = session.get("customer_data", {})
-            if customer_data.get("appointment_confirmed"):
-                completed_appointments += 1
-
-        conversion_rate = (completed_appointments / total_conversations * 100) if total_conversations > 0 else 0
-
-        return {
-            "total_conversations": total_conversations,
-            "completed_appointments": completed_appointments,
-            "conversion_rate": round(conversion_rate, 2),
-            "top_intents": sorted(intents.items(), key=lambda x: x[1], reverse=True)[:5],
-            "popular_vehicles": sorted(vehicle_models.items(), key=lambda x: x[1], reverse=True)[:10]
-        }
+        """Get conversation analytics (reads running counters)"""
+        analytics = self.agent_service.stats.snapshot()
+        analytics["active_sessions"] = len(self.agent_service.get_all_sessions())
+        return analytics
 
     def get_session_analytics(self, session_id: str) -> Dict[str, Any]:
         """Get analytics for a specific session"""
@@ -400,10 +1091,11 @@ class AnalyticsService:
             "session_id": session_id,
             "created_at": session["created_at"],
             "last_activity": session["last_activity"],
-            "message_count": len(session.get("messages", [])),
+            "message_count": session.get("message_count", 0),
             "duration": (session["last_activity"] - session["created_at"]).total_seconds(),
             "stage": session.get("stage", "unknown"),
-            "has_customer_data": bool(session.get("customer_data"))
+            "has_customer_data": bool(session.get("customer_data")),
+            "tokens": self.agent_service.get_session_tokens(session_id)
         }
 
 # Service instances
@@ -412,13 +1104,60 @@ scraping_service = None
 competitor_service = None
 analytics_service = None
 
-def initialize_services(graph, tools):
+def initialize_services(graph, tools, config: Optional[APIConfiguration] = None, history_manager=None):
     """Initialize all service instances"""
     global luciano_service, scraping_service, competitor_service, analytics_service
 
-    luciano_service = LucianoAgentService(graph, tools)
-    scraping_service = WebScrapingService()
-    competitor_service = CompetitorAnalysisService(scraping_service)
+    config = config or APIConfiguration()
+    runner = AgentRunner(graph, max_concurrency=config.max_concurrent_agent_runs)
+
+    if config.session_backend == "sqlite":
+        if config.checkpointer == "memory":
+            logger.warning(
+                "SESSION_BACKEND=sqlite with CHECKPOINTER=memory: conversation history stays in each worker's "
+                "memory and is lost when a session reaches another worker; use CHECKPOINTER=sqlite or keep "
+                "each session on one worker"
+            )
+        session_store = SqliteSessionStore(
+            db_path=config.session_db_path,
+            max_sessions=config.max_sessions,
+            ttl_seconds=config.session_timeout
+        )
+    else:
+        session_store = ShardedSessionStore(
+            shards=config.session_shards,
+            max_sessions=config.max_sessions,
+            ttl_seconds=config.session_timeout
+        )
+
+    luciano_service = LucianoAgentService(
+        graph, tools,
+        runner=runner,
+        history_manager=history_manager,
+        session_store=session_store,
+        enable_fast_path=config.enable_fast_path,
+        enable_templates=config.enable_response_templates
+    )
+    scraping_service = WebScrapingService(
+        base_url=config.firecrawl_base_url,
+        max_concurrency_per_host=config.scrape_max_concurrency_per_host,
+        timeout=config.scrape_timeout,
+        max_retries=config.scrape_max_retries,
+        crawl_workers_per_job=config.crawl_workers_per_job,
+        crawl_max_running_jobs=config.crawl_max_running_jobs,
+        cache=ScrapeCache(max_entries=config.scrape_cache_max_entries, default_max_age=config.scrape_cache_max_age)
+    )
+    competitor_service = CompetitorAnalysisService(
+        scraping_service,
+        max_concurrency=config.competitor_max_concurrency,
+        snapshot_options={
+            "max_age": config.competitor_snapshot_max_age,
+            "refresh_interval": config.competitor_refresh_interval,
+            "locations": config.competitor_locations,
+            "path": config.competitor_snapshot_path,
+            "scheduler_enabled": config.competitor_scheduler_enabled
+        }
+    )
     analytics_service = AnalyticsService(luciano_service)
 
     logger.info("All services initialized successfully")
@@ -0,0 +1,639 @@
+"""
+Session stores for the Luciano agent
+
+All stores implement SessionBackend. The in-memory SessionStore keeps
+sessions in an OrderedDict in least-recently-active order, so touching a
+session, evicting the least recently used one and expiring idle ones are all
+O(1) per session instead of full scans. ShardedSessionStore splits sessions
+across independently locked shards so worker threads don't contend on a
+single structure. SqliteSessionStore persists sessions to a shared SQLite
+file so several worker processes see the same sessions.
+
+Request handlers use the ``a*`` variants (``aget_or_create``, ``atouch``,
+``aupdate``, ``aitems``, ``aget_stats``): in-memory stores answer inline,
+SQLite runs the blocking call in a worker thread so a busy database never
+stalls the event loop.
+"""
+
+import abc
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from itertools import count
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+import xxhash
+import zstandard
+from langchain_core.messages import messages_from_dict, messages_to_dict
+
+logger = logging.getLogger(__name__)
+
+# session_<2 hex shard>-<uuid4 hex>; uuid4 is random so ids never collide
+SESSION_ID_PATTERN = re.compile(r"^session_([0-9a-f]{2})-[0-9a-f]{32}$")
+
+def generate_session_id(shard: int = 0) -> str:
+    """Generate a collision-free session ID that encodes its shard"""
+    return f"session_{shard:02x}-{uuid.uuid4().hex}"
+
+class SessionBackend(MutableMapping):
+    """Interface of the session stores used by LucianoAgentService
+
+    Besides the mapping protocol a backend must create sessions atomically,
+    refresh their activity, expire idle ones and report counters. Stores
+    that hand out copies (persistent backends) write changes back in
+    ``save``; in-memory stores return live dicts and don't need to.
+    """
+
+    on_evict: Optional[Callable[[str, Dict], None]]
+    # Whether calls block on I/O (and may call on_evict from a worker thread in the async variants)
+    blocking: bool = False
+
+    @abc.abstractmethod
+    def get_or_create(self, session_id: str, factory: Callable[[], Dict]) -> Tuple[Dict, bool]:
+        """Get a live session or insert a new one built by ``factory``"""
+
+    @abc.abstractmethod
+    def touch(self, session_id: str) -> Dict:
+        """Mark a session as active now and return it"""
+
+    @abc.abstractmethod
+    def expire(self, ttl_seconds: Optional[float] = None) -> int:
+        """Drop idle sessions, returning how many were removed"""
+
+    @abc.abstractmethod
+    def new_session_id(self) -> str:
+        """Generate an ID for a new session"""
+
+    @abc.abstractmethod
+    def get_stats(self) -> Dict[str, Any]:
+        """Get size limits and eviction counters"""
+
+    def save(self, session_id: str, session: Dict):
+        """Persist changes made to a session dict"""
+
+    def update(self, session_id: str, mutate: Callable[[Dict], None]) -> Optional[Dict]:
+        """Apply ``mutate`` to the stored session and persist it (None if it is gone)
+
+        Persistent backends re-read the session and write it back in one
+        transaction, so concurrent changes from other workers aren't lost.
+        """
+        try:
+            session = self[session_id]
+        except KeyError:
+            return None
+        mutate(session)
+        self.save(session_id, session)
+        return session
+
+    async def _call(self, method: Callable, *args: Any) -> Any:
+        if self.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def aget_or_create(self, session_id: str, factory: Callable[[], Dict]) -> Tuple[Dict, bool]:
+        """``get_or_create`` for callers on the event loop"""
+        return await self._call(self.get_or_create, session_id, factory)
+
+    async def atouch(self, session_id: str) -> Dict:
+        """``touch`` for callers on the event loop"""
+        return await self._call(self.touch, session_id)
+
+    async def aupdate(self, session_id: str, mutate: Callable[[Dict], None]) -> Optional[Dict]:
+        """``update`` for callers on the event loop (``mutate`` may run in a worker thread)"""
+        return await self._call(self.update, session_id, mutate)
+
+    async def aitems(self) -> List[Tuple[str, Dict]]:
+        """``items`` for callers on the event loop"""
+        return await self._call(self.items)
+
+    async def aget_stats(self) -> Dict[str, Any]:
+        """``get_stats`` for callers on the event loop"""
+        return await self._call(self.get_stats)
+
+class SessionStore(SessionBackend):
+    """LRU + TTL mapping of session_id -> session dict
+
+    Enforces ``max_sessions`` (least recently active session is evicted on
+    overflow) and ``ttl_seconds`` (sessions idle for longer are dropped
+    lazily on access and on every insert). ``on_evict`` is called with the
+    session id and data of every session that leaves the store.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        ttl_seconds: int = 3600,
+        on_evict: Optional[Callable[[str, Dict], None]] = None
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self._sessions: "OrderedDict[str, Dict]" = OrderedDict()
+        self.created = 0
+        self.evicted_lru = 0
+        self.evicted_expired = 0
+        self.deleted = 0
+
+    def _is_expired(self, session: Dict, now: datetime) -> bool:
+        return now - session["last_activity"] > timedelta(seconds=self.ttl_seconds)
+
+    def _evict(self, session_id: str, reason: str):
+        session = self._sessions.pop(session_id)
+        if reason == "lru":
+            self.evicted_lru += 1
+        elif reason == "expired":
+            self.evicted_expired += 1
+        else:
+            self.deleted += 1
+
+        if self.on_evict:
+            try:
+                self.on_evict(session_id, session)
+            except Exception as e:
+                logger.warning(f"Error releasing session {session_id}: {str(e)}")
+
+    def expire(self, ttl_seconds: Optional[float] = None) -> int:
+        """Drop idle sessions; only the expired head of the LRU order is visited"""
+        ttl = timedelta(seconds=self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        now = datetime.now()
+        expired = 0
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session["last_activity"] <= ttl:
+                break
+            self._evict(session_id, "expired")
+            expired += 1
+        return expired
+
+    def oldest_activity(self) -> Optional[datetime]:
+        """Last activity of the least recently active session (None when empty)"""
+        if not self._sessions:
+            return None
+        return next(iter(self._sessions.values()))["last_activity"]
+
+    def evict_lru(self) -> bool:
+        """Evict the least recently active session, False when empty"""
+        if not self._sessions:
+            return False
+        self._evict(next(iter(self._sessions)), "lru")
+        return True
+
+    def get_or_create(self, session_id: str, factory: Callable[[], Dict]) -> Tuple[Dict, bool]:
+        """Get a live session or insert a new one built by ``factory``"""
+        try:
+            return self[session_id], False
+        except KeyError:
+            session = factory()
+            self[session_id] = session
+            return session, True
+
+    def new_session_id(self) -> str:
+        """Generate an ID for a new session"""
+        return generate_session_id()
+
+    def touch(self, session_id: str) -> Dict:
+        """Mark a session as active now and move it to the MRU end"""
+        session = self._sessions[session_id]
+        session["last_activity"] = datetime.now()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def __getitem__(self, session_id: str) -> Dict:
+        session = self._sessions[session_id]
+        if self._is_expired(session, datetime.now()):
+            self._evict(session_id, "expired")
+            raise KeyError(session_id)
+        return session
+
+    def __setitem__(self, session_id: str, session: Dict):
+        if session_id in self._sessions:
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            return
+
+        self.expire()
+        while len(self._sessions) >= self.max_sessions:
+            self._evict(next(iter(self._sessions)), "lru")
+
+        self._sessions[session_id] = session
+        self.created += 1
+
+    def __delitem__(self, session_id: str):
+        if session_id not in self._sessions:
+            raise KeyError(session_id)
+        self._evict(session_id, "deleted")
+
+    def __contains__(self, session_id: object) -> bool:
+        try:
+            self[session_id]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[str]:
+        self.expire()
+        return iter(list(self._sessions))
+
+    def items(self) -> List[Tuple[str, Dict]]:
+        """Snapshot of live sessions (expired ones are dropped first)"""
+        self.expire()
+        return list(self._sessions.items())
+
+    def values(self) -> List[Dict]:
+        """Snapshot of live session dicts"""
+        self.expire()
+        return list(self._sessions.values())
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get size limits and eviction counters"""
+        return {
+            "active_sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+            "created": self.created,
+            "evicted_lru": self.evicted_lru,
+            "evicted_expired": self.evicted_expired,
+            "deleted": self.deleted
+        }
+
+class ShardedSessionStore(SessionBackend):
+    """Session store split into ``shards`` LRU + TTL shards with one lock each
+
+    Generated session IDs encode their shard; client-supplied IDs are routed
+    by hash, so shards fill unevenly. ``max_sessions`` is therefore enforced
+    across all shards: on overflow the least recently active session of any
+    shard (the oldest shard head) is evicted.
+    """
+
+    def __init__(
+        self,
+        shards: int = 16,
+        max_sessions: int = 1000,
+        ttl_seconds: int = 3600,
+        on_evict: Optional[Callable[[str, Dict], None]] = None
+    ):
+        if not 1 <= shards <= 256:
+            raise ValueError("shards must be between 1 and 256")
+
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        # Any shard may hold every session; the global limit is enforced in _enforce_limit
+        self._shards = [SessionStore(max_sessions, ttl_seconds, on_evict) for _ in range(shards)]
+        self._locks = [threading.RLock() for _ in range(shards)]
+        self._limit_lock = threading.Lock()
+        self._next_shard = count()
+
+    @property
+    def on_evict(self) -> Optional[Callable[[str, Dict], None]]:
+        return self._shards[0].on_evict
+
+    @on_evict.setter
+    def on_evict(self, callback: Optional[Callable[[str, Dict], None]]):
+        for shard in self._shards:
+            shard.on_evict = callback
+
+    def shard_index(self, session_id: str) -> int:
+        """Shard holding a session ID"""
+        match = SESSION_ID_PATTERN.match(session_id)
+        if match and int(match.group(1), 16) < len(self._shards):
+            return int(match.group(1), 16)
+        return xxhash.xxh64_intdigest(session_id.encode("utf-8")) % len(self._shards)
+
+    def _shard(self, session_id: str) -> Tuple[SessionStore, threading.RLock]:
+        index = self.shard_index(session_id)
+        return self._shards[index], self._locks[index]
+
+    def new_session_id(self) -> str:
+        """Generate an ID for a new session, spreading sessions round-robin"""
+        return generate_session_id(next(self._next_shard) % len(self._shards))
+
+    def _enforce_limit(self):
+        """Evict the globally least recently active sessions until within ``max_sessions``
+
+        Called without any shard lock held; each shard lock is taken on its
+        own, so this never deadlocks with a request on another shard.
+        """
+        with self._limit_lock:
+            while len(self) > self.max_sessions:
+                oldest = None
+                for index, (shard, lock) in enumerate(zip(self._shards, self._locks)):
+                    with lock:
+                        activity = shard.oldest_activity()
+                    if activity is not None and (oldest is None or activity < oldest[0]):
+                        oldest = (activity, index)
+                if oldest is None:
+                    return
+                with self._locks[oldest[1]]:
+                    self._shards[oldest[1]].evict_lru()
+
+    def get_or_create(self, session_id: str, factory: Callable[[], Dict]) -> Tuple[Dict, bool]:
+        shard, lock = self._shard(session_id)
+        with lock:
+            session, created = shard.get_or_create(session_id, factory)
+        if created:
+            self._enforce_limit()
+        return session, created
+
+    def touch(self, session_id: str) -> Dict:
+        shard, lock = self._shard(session_id)
+        with lock:
+            return shard.touch(session_id)
+
+    def update(self, session_id: str, mutate: Callable[[Dict], None]) -> Optional[Dict]:
+        shard, lock = self._shard(session_id)
+        with lock:
+            return shard.update(session_id, mutate)
+
+    def expire(self, ttl_seconds: Optional[float] = None) -> int:
+        expired = 0
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                expired += shard.expire(ttl_seconds)
+        return expired
+
+    def __getitem__(self, session_id: str) -> Dict:
+        shard, lock = self._shard(session_id)
+        with lock:
+            return shard[session_id]
+
+    def __setitem__(self, session_id: str, session: Dict):
+        shard, lock = self._shard(session_id)
+        with lock:
+            shard[session_id] = session
+        self._enforce_limit()
+
+    def __delitem__(self, session_id: str):
+        shard, lock = self._shard(session_id)
+        with lock:
+            del shard[session_id]
+
+    def __contains__(self, session_id: object) -> bool:
+        shard, lock = self._shard(session_id)
+        with lock:
+            return session_id in shard
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([session_id for session_id, _ in self.items()])
+
+    def items(self) -> List[Tuple[str, Dict]]:
+        items = []
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                items.extend(shard.items())
+        return items
+
+    def values(self) -> List[Dict]:
+        return [session for _, session in self.items()]
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get aggregate limits and eviction counters across shards"""
+        shard_stats = [shard.get_stats() for shard in self._shards]
+        return {
+            "active_sessions": sum(s["active_sessions"] for s in shard_stats),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+            "shards": len(self._shards),
+            "largest_shard": max(s["active_sessions"] for s in shard_stats),
+            "created": sum(s["created"] for s in shard_stats),
+            "evicted_lru": sum(s["evicted_lru"] for s in shard_stats),
+            "evicted_expired": sum(s["evicted_expired"] for s in shard_stats),
+            "deleted": sum(s["deleted"] for s in shard_stats)
+        }
+
+class SqliteSessionStore(SessionBackend):
+    """Session store persisted to SQLite in WAL mode
+
+    One row per session; the session dict (including any in-session message
+    history) is stored as a zstd-compressed orjson blob, so a chat turn
+    costs one small row read and write. WAL mode lets several worker
+    processes share the file with concurrent readers. Returned dicts are
+    copies: call ``save`` after changing them, or ``update`` to change a
+    session that other workers may be changing too.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        db_path: str = "data/sessions.sqlite",
+        max_sessions: int = 1000,
+        ttl_seconds: int = 3600,
+        on_evict: Optional[Callable[[str, Dict], None]] = None,
+        compression_level: int = 3
+    ):
+        self.db_path = db_path
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+        self._decompressor = zstandard.ZstdDecompressor()
+        self.created = 0
+        self.evicted_lru = 0
+        self.evicted_expired = 0
+        self.deleted = 0
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, last_activity REAL NOT NULL, data BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_activity ON sessions (last_activity)")
+
+    def _encode(self, session: Dict) -> bytes:
+        data = dict(session)
+        data["messages"] = messages_to_dict(session.get("messages", []))
+        payload = orjson.dumps(data, default=str)
+        return zstandard.ZstdCompressor(level=self.compression_level).compress(payload)
+
+    def _decode(self, blob: bytes) -> Dict:
+        data = orjson.loads(self._decompressor.decompress(blob))
+        data["messages"] = messages_from_dict(data.get("messages", []))
+        for key in ("created_at", "last_activity"):
+            if isinstance(data.get(key), str):
+                data[key] = datetime.fromisoformat(data[key])
+        return data
+
+    def _release(self, rows: List[Tuple[str, bytes]], reason: str):
+        """Delete rows and notify ``on_evict`` (caller holds the lock)"""
+        if not rows:
+            return
+        self._conn.executemany("DELETE FROM sessions WHERE session_id = ?", [(row[0],) for row in rows])
+        for session_id, blob in rows:
+            if reason == "lru":
+                self.evicted_lru += 1
+            elif reason == "expired":
+                self.evicted_expired += 1
+            else:
+                self.deleted += 1
+
+            if self.on_evict:
+                try:
+                    self.on_evict(session_id, self._decode(blob))
+                except Exception as e:
+                    logger.warning(f"Error releasing session {session_id}: {str(e)}")
+
+    def _expire_locked(self, ttl_seconds: float) -> int:
+        cutoff = datetime.now().timestamp() - ttl_seconds
+        rows = self._conn.execute(
+            "SELECT session_id, data FROM sessions WHERE last_activity < ?", (cutoff,)
+        ).fetchall()
+        self._release(rows, "expired")
+        return len(rows)
+
+    def expire(self, ttl_seconds: Optional[float] = None) -> int:
+        with self._lock:
+            return self._expire_locked(self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+
+    def get_or_create(self, session_id: str, factory: Callable[[], Dict]) -> Tuple[Dict, bool]:
+        try:
+            return self[session_id], False
+        except KeyError:
+            pass
+
+        session = factory()
+        with self._lock:
+            self._expire_locked(self.ttl_seconds)
+            overflow = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_sessions + 1
+            if overflow > 0:
+                rows = self._conn.execute(
+                    "SELECT session_id, data FROM sessions ORDER BY last_activity LIMIT ?", (overflow,)
+                ).fetchall()
+                self._release(rows, "lru")
+
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO sessions (session_id, last_activity, data) VALUES (?, ?, ?)",
+                (session_id, session["last_activity"].timestamp(), self._encode(session))
+            ).rowcount
+        if not inserted:
+            # Another worker created it first
+            return self[session_id], False
+
+        self.created += 1
+        return session, True
+
+    def new_session_id(self) -> str:
+        return generate_session_id()
+
+    def touch(self, session_id: str) -> Dict:
+        now = datetime.now()
+        with self._lock:
+            row = self._conn.execute(
+                "UPDATE sessions SET last_activity = ? WHERE session_id = ? RETURNING data",
+                (now.timestamp(), session_id)
+            ).fetchone()
+        if row is None:
+            raise KeyError(session_id)
+
+        session = self._decode(row[0])
+        session["last_activity"] = now
+        return session
+
+    def save(self, session_id: str, session: Dict):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sessions SET last_activity = ?, data = ? WHERE session_id = ?",
+                (session["last_activity"].timestamp(), self._encode(session), session_id)
+            )
+
+    def update(self, session_id: str, mutate: Callable[[Dict], None]) -> Optional[Dict]:
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front: another worker's
+            # update of the same row waits instead of being overwritten
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+                if row is None:
+                    self._conn.execute("ROLLBACK")
+                    return None
+                session = self._decode(row[0])
+                mutate(session)
+                self._conn.execute(
+                    "UPDATE sessions SET last_activity = ?, data = ? WHERE session_id = ?",
+                    (session["last_activity"].timestamp(), self._encode(session), session_id)
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return session
+
+    def __getitem__(self, session_id: str) -> Dict:
+        cutoff = datetime.now().timestamp() - self.ttl_seconds
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM sessions WHERE session_id = ? AND last_activity >= ?", (session_id, cutoff)
+            ).fetchone()
+        if row is None:
+            raise KeyError(session_id)
+        return self._decode(row[0])
+
+    def __setitem__(self, session_id: str, session: Dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, last_activity, data) VALUES (?, ?, ?)",
+                (session_id, session["last_activity"].timestamp(), self._encode(session))
+            )
+
+    def __delitem__(self, session_id: str):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id, data FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchall()
+            if not rows:
+                raise KeyError(session_id)
+            self._release(rows, "deleted")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([session_id for session_id, _ in self.items()])
+
+    def items(self) -> List[Tuple[str, Dict]]:
+        with self._lock:
+            self._expire_locked(self.ttl_seconds)
+            rows = self._conn.execute("SELECT session_id, data FROM sessions ORDER BY last_activity").fetchall()
+        return [(session_id, self._decode(blob)) for session_id, blob in rows]
+
+    def values(self) -> List[Dict]:
+        return [session for _, session in self.items()]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get size limits and this process' eviction counters"""
+        return {
+            "backend": "sqlite",
+            "active_sessions": len(self),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+            "db_bytes": os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0,
+            "created": self.created,
+            "evicted_lru": self.evicted_lru,
+            "evicted_expired": self.evicted_expired,
+            "deleted": self.deleted
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
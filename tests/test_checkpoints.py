@@ -0,0 +1,66 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+from checkpoints import open_checkpointer
+
+def _echo_graph(checkpointer):
+    def reply(state: MessagesState):
+        return {"messages": [AIMessage(content=f"resposta para: {state['messages'][-1].content}")]}
+
+    def review(state: MessagesState):
+        # A second superstep, like the agent's tool round-trips
+        return {}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("reply", reply)
+    builder.add_node("review", review)
+    builder.add_edge(START, "reply")
+    builder.add_edge("reply", "review")
+    builder.add_edge("review", END)
+    return builder.compile(checkpointer=checkpointer)
+
+async def _run_turns(graph, thread_id: str, turns: int):
+    config = {"configurable": {"thread_id": thread_id}}
+    for turn in range(turns):
+        await graph.ainvoke({"messages": [HumanMessage(content=f"mensagem {turn} " + "x" * 200)]}, config)
+    return config
+
+def test_memory_checkpointer_keeps_one_checkpoint_per_thread():
+    async def scenario():
+        async with open_checkpointer("memory") as saver:
+            graph = _echo_graph(saver)
+            config = await _run_turns(graph, "s1", 40)
+            await _run_turns(graph, "s2", 3)
+
+            state = await graph.aget_state(config)
+            assert len(state.values["messages"]) == 80
+
+            assert len(saver.storage["s1"][""]) == 1
+            assert len(saver.storage["s2"][""]) == 1
+            assert all(key[2] in (saver.storage[key[0]][key[1]]) for key in saver.writes)
+
+            # Only the current version of each channel is kept
+            blob_bytes = sum(len(blob[1]) for key, blob in saver.blobs.items() if key[0] == "s1")
+            messages_bytes = len(saver.serde.dumps_typed(state.values["messages"])[1])
+            assert blob_bytes <= messages_bytes * 1.1
+
+            saver.delete_thread("s1")
+            assert not any(key[0] == "s1" for key in saver.blobs)
+            assert not any(key[0] == "s1" for key in saver._latest)
+
+    asyncio.run(scenario())
+
+def test_sqlite_checkpointer_keeps_one_checkpoint_per_thread(tmp_path):
+    async def scenario():
+        async with open_checkpointer("sqlite", str(tmp_path / "checkpoints.sqlite")) as saver:
+            graph = _echo_graph(saver)
+            config = await _run_turns(graph, "s1", 20)
+
+            state = await graph.aget_state(config)
+            assert len(state.values["messages"]) == 40
+            async with saver.conn.execute("SELECT COUNT(*) FROM checkpoints WHERE thread_id = 's1'") as cursor:
+                assert (await cursor.fetchone())[0] == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,38 @@
+from fast_path import FastPathRouter
+from intents import detect_intent
+from models import ServiceInfo, VehicleCategory
+
+def _router() -> FastPathRouter:
+    def service(name: str, price_p: float, price_g: float) -> ServiceInfo:
+        return ServiceInfo(name=name, category=VehicleCategory.PEQUENO, price_p=price_p, price_g=price_g,
+                           duration_minutes=60, description="Descrição do serviço")
+
+    return FastPathRouter({
+        "Preventiva": service("Preventiva", 45.0, 60.0),
+        "Premium": service("Premium", 120.0, 150.0),
+        "Polimento": service("Polimento Comercial", 400.0, 500.0),
+        "Vitrificação": service("Vitrificação", 800.0, 1000.0),
+        "Limpeza Interna": service("Limpeza Interna Completa", 150.0, 180.0)
+    }, detect_intent)
+
+def test_price_reply_for_a_vehicle():
+    reply = _router().route("quanto custa o premium pro gol?")
+    assert reply == "O Premium para Gol (carro pequeno) sai por R$ 120,00. Quer agendar um horário? 🚗"
+
+def test_year_does_not_pick_the_suv_price():
+    reply = _router().route("quanto custa o premium pro meu carro de 2008?")
+    assert "R$ 120,00" in reply and "para carros pequenos" in reply
+
+def test_service_narrowed_to_a_part_goes_to_the_agent():
+    router = _router()
+    assert router.route("quanto custa o polimento do farol?") is None
+    assert router.route("quanto custa a limpeza interna dos bancos?") is None
+    assert router.route("quanto custa o polimento da minha hilux?").startswith("O Polimento Comercial para Hilux")
+    assert router.route("quanto custa a limpeza interna do meu carro?") is not None
+
+def test_catalog_reply_offers_the_top_three_from_the_highest_price():
+    reply = _router().route("quais os serviços de vocês?")
+    assert reply == (
+        "Temos Vitrificação (a partir de R$ 800,00), Polimento Comercial (a partir de R$ 400,00) "
+        "e Limpeza Interna Completa (a partir de R$ 150,00). Qual o modelo do seu carro? Assim te passo o valor exato 🚗"
+    )
@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta
+
+from session_store import ShardedSessionStore
+
+def _new_session():
+    return {"messages": [], "message_count": 0, "created_at": datetime.now(), "last_activity": datetime.now()}
+
+def test_sharded_store_enforces_the_limit_globally():
+    evicted = []
+    store = ShardedSessionStore(shards=16, max_sessions=1000, on_evict=lambda session_id, _: evicted.append(session_id))
+
+    # Client-supplied IDs hash unevenly across shards
+    for i in range(1000):
+        store.get_or_create(f"cliente-{i}", _new_session)
+    assert len(store) == 1000
+    assert evicted == []
+
+    store.get_or_create("cliente-extra", _new_session)
+    assert len(store) == 1000
+    assert len(evicted) == 1
+
+def test_sharded_store_evicts_the_least_recently_active_session():
+    store = ShardedSessionStore(shards=4, max_sessions=3)
+    for session_id in ("a", "b", "c"):
+        store.get_or_create(session_id, _new_session)
+    store.touch("a")
+
+    store.get_or_create("d", _new_session)
+    assert set(store) == {"a", "c", "d"}
@@ -0,0 +1,18 @@
+from vehicle_catalog import get_vehicle_catalog
+
+def test_year_is_not_read_as_a_numeric_model():
+    catalog = get_vehicle_catalog()
+    assert catalog.find_in_text("quanto custa o premium pro meu carro de 2008?") is None
+
+def test_model_followed_by_year():
+    match = get_vehicle_catalog().find_in_text("meu onix 2019")
+    assert match is not None and match.model == "Onix" and match.category == "P"
+
+def test_numeric_model_next_to_its_brand():
+    catalog = get_vehicle_catalog()
+    assert catalog.find_in_text("tenho um peugeot 2008").model == "2008"
+    assert catalog.find_in_text("e um 2008 peugeot").model == "2008"
+
+def test_numeric_model_name_field():
+    # A model field holds only the model, so "2008" is the Peugeot there
+    assert get_vehicle_catalog().category("2008") == "G"
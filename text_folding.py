@@ -0,0 +1,19 @@
+"""
+Accent folding shared by every text matcher
+
+Intent keywords, service aliases, vehicle names, chat templates and search
+cache keys all compare text folded the same way: lowercase, with combining
+marks (accents, cedilla) removed after NFKD decomposition, so "Preço",
+"preço" and "preco" are one word everywhere.
+"""
+
+import unicodedata
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents ("Vitrificação" -> "vitrificacao")"""
+    lowered = text.lower()
+    if lowered.isascii():
+        # Nothing to strip; most chat messages and queries
+        return lowered
+    decomposed = unicodedata.normalize("NFKD", lowered)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
@@ -0,0 +1,178 @@
+"""
+Vehicle model catalog for price category classification (P/G)
+
+The catalog is loaded once from ``catalog/vehicles.json``. Model names and
+aliases are normalized (lowercase, no accents, no punctuation or spaces) so
+"HR-V", "hr v" and "hrv" share one key in an exact index; typos ("corola",
+"hillux") fall back to a character trigram index. Lookups are memoized.
+
+Purely numeric models ("2008", "208") are also years and mileages, so in
+free text they only count next to their brand ("peugeot 2008", "2008
+peugeot"), never on their own ("meu carro de 2008").
+"""
+
+import functools
+import json
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from text_folding import fold
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog", "vehicles.json")
+
+# Unknown models are priced as small vehicles, like before the catalog
+DEFAULT_CATEGORY = "P"
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+def normalize_model(text: str) -> str:
+    """Normalization key of a model name ("HR-V" -> "hrv")"""
+    return "".join(_TOKEN.findall(fold(text)))
+
+def _trigrams(key: str) -> Counter:
+    padded = f"${key}$"
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+@dataclass(frozen=True)
+class VehicleMatch:
+    brand: str
+    model: str
+    category: str
+    match: str  # "exact" or "fuzzy"
+    score: float
+
+class VehicleCatalog:
+    """Exact + trigram fuzzy index over vehicle models and aliases"""
+
+    def __init__(self, vehicles: List[Dict[str, Any]], fuzzy_threshold: float = 0.6, max_ngram: int = 3,
+                 cache_size: int = 8192):
+        self.vehicles = vehicles
+        self.fuzzy_threshold = fuzzy_threshold
+        self.max_ngram = max_ngram
+        # normalized alias -> vehicle
+        self._exact: Dict[str, Dict[str, Any]] = {}
+        # trigram -> normalized aliases containing it
+        self._trigram_index: Dict[str, List[str]] = {}
+        self._alias_trigrams: Dict[str, Counter] = {}
+
+        for vehicle in vehicles:
+            for alias in [vehicle["model"]] + vehicle.get("aliases", []):
+                key = normalize_model(alias)
+                if not key or key in self._exact:
+                    continue
+                self._exact[key] = vehicle
+                if key.isdigit():
+                    # "2008" is also a year; numeric names are matched exactly only
+                    continue
+                grams = _trigrams(key)
+                self._alias_trigrams[key] = grams
+                for gram in grams:
+                    self._trigram_index.setdefault(gram, []).append(key)
+
+        self.lookup = functools.lru_cache(maxsize=cache_size)(self._lookup)
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_CATALOG_PATH, **options) -> "VehicleCatalog":
+        """Load the catalog from a JSON data file"""
+        with open(path, encoding="utf-8") as catalog_file:
+            return cls(json.load(catalog_file)["vehicles"], **options)
+
+    def _candidates(self, tokens: List[str]):
+        """(start, size, key) for concatenations of up to ``max_ngram`` adjacent tokens, longest first"""
+        for size in range(min(self.max_ngram, len(tokens)), 0, -1):
+            for start in range(len(tokens) - size + 1):
+                yield start, size, "".join(tokens[start:start + size])
+
+    @staticmethod
+    def _next_to_brand(tokens: List[str], start: int, size: int, vehicle: Dict[str, Any]) -> bool:
+        brand_tokens = set(_TOKEN.findall(fold(vehicle["brand"])))
+        neighbours = tokens[max(start - 1, 0):start] + tokens[start + size:start + size + 1]
+        return any(token in brand_tokens for token in neighbours)
+
+    def _exact_match(self, tokens: List[str], free_text: bool = False) -> Optional[Dict[str, Any]]:
+        numeric = None
+        for start, size, key in self._candidates(tokens):
+            vehicle = self._exact.get(key)
+            if vehicle is None:
+                continue
+            if not key.isdigit():
+                return vehicle
+            if numeric is None and (not free_text or self._next_to_brand(tokens, start, size, vehicle)):
+                numeric = vehicle
+        return numeric
+
+    def _fuzzy_match(self, tokens: List[str]) -> Tuple[Optional[Dict[str, Any]], float]:
+        best, best_score = None, 0.0
+        for _start, _size, key in self._candidates(tokens[:6]):
+            if len(key) < 4 or key.isdigit():
+                continue
+            grams = _trigrams(key)
+            shared = Counter()
+            for gram in grams:
+                for alias in self._trigram_index.get(gram, ()):
+                    shared[alias] += 1
+            size = sum(grams.values())
+            for alias, _count in shared.most_common(5):
+                alias_grams = self._alias_trigrams[alias]
+                # Dice coefficient over trigram multisets
+                score = 2 * sum((grams & alias_grams).values()) / (size + sum(alias_grams.values()))
+                if score > best_score:
+                    best, best_score = self._exact[alias], score
+        if best_score < self.fuzzy_threshold:
+            return None, 0.0
+        return best, best_score
+
+    def _lookup(self, text: str, fuzzy: bool = True, free_text: bool = False) -> Optional[VehicleMatch]:
+        tokens = _TOKEN.findall(fold(text))
+        if not tokens:
+            return None
+
+        vehicle = self._exact_match(tokens, free_text)
+        if vehicle is not None:
+            return VehicleMatch(vehicle["brand"], vehicle["model"], vehicle["category"], "exact", 1.0)
+
+        if fuzzy:
+            vehicle, score = self._fuzzy_match(tokens)
+            if vehicle is not None:
+                return VehicleMatch(vehicle["brand"], vehicle["model"], vehicle["category"], "fuzzy", round(score, 3))
+        return None
+
+    def category(self, model: str) -> str:
+        """Price category ("P" or "G") of a model name"""
+        match = self.lookup(model)
+        return match.category if match else DEFAULT_CATEGORY
+
+    def classify_many(self, models: List[str]) -> List[Optional[VehicleMatch]]:
+        """Look up many model names (e.g. a fleet list) in one call"""
+        return [self.lookup(model) for model in models]
+
+    def find_in_text(self, text: str) -> Optional[VehicleMatch]:
+        """Vehicle named in a free-text message (exact matches only)"""
+        return self.lookup(text, fuzzy=False, free_text=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get catalog and lookup cache statistics"""
+        cache = self.lookup.cache_info()
+        return {
+            "vehicles": len(self.vehicles),
+            "aliases": len(self._exact),
+            "cache_hits": cache.hits,
+            "cache_misses": cache.misses,
+            "cache_size": cache.currsize
+        }
+
+_vehicle_catalog: Optional[VehicleCatalog] = None
+_vehicle_catalog_lock = threading.Lock()
+
+def get_vehicle_catalog() -> VehicleCatalog:
+    """Get the shared catalog, loaded once (VEHICLE_CATALOG_PATH overrides the file)"""
+    global _vehicle_catalog
+    if _vehicle_catalog is None:
+        with _vehicle_catalog_lock:
+            if _vehicle_catalog is None:
+                _vehicle_catalog = VehicleCatalog.from_file(os.getenv("VEHICLE_CATALOG_PATH") or DEFAULT_CATALOG_PATH)
+    return _vehicle_catalog